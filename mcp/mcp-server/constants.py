@@ -5,56 +5,134 @@ Constants - Centralized configuration for LLM models and other constants
 
 # Standard library imports
 import os
+from functools import lru_cache
+from typing import NamedTuple, Tuple
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# =============================================================================
+# RESOLVED CONFIGURATION
+# =============================================================================
+
+class Config(NamedTuple):
+    """Immutable snapshot of the environment-driven configuration"""
+    # LLM models
+    OPENAI_CHAT_MODEL: str
+    OPENAI_EMBEDDING_MODEL: str
+    # PostgreSQL
+    POSTGRES_HOST: str
+    POSTGRES_PORT: int
+    POSTGRES_DB: str
+    POSTGRES_USER: str
+    POSTGRES_PASSWORD: str
+    POSTGRES_FALLBACK_HOSTS: Tuple[str, ...]
+    POSTGRES_POOL_MINCONN: int
+    POSTGRES_POOL_MAXCONN: int
+    SQL_MAX_ROWS: int
+    # Qdrant
+    QDRANT_HOST: str
+    QDRANT_PORT: int
+    QDRANT_URL: str
+    # RAG
+    CHUNK_SIZE: int
+    CHUNK_OVERLAP: int
+    DEFAULT_TOP_K: int
+    # Data
+    DATA_DIR: str
+    # Server
+    SERVER_NAME: str
+    SERVER_VERSION: str
+    TRANSPORT_MODE: str
+
+@lru_cache(maxsize=1)
+def _load_config() -> Config:
+    """Load .env once and resolve every environment-driven setting"""
+    load_dotenv()
+    return Config(
+        OPENAI_CHAT_MODEL=os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini"),
+        OPENAI_EMBEDDING_MODEL=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"),
+        POSTGRES_HOST=os.getenv("POSTGRES_HOST", "postgres"),
+        POSTGRES_PORT=int(os.getenv("POSTGRES_PORT", "5432")),
+        POSTGRES_DB=os.getenv("POSTGRES_DB", "camera_feeds"),
+        POSTGRES_USER=os.getenv("POSTGRES_USER", "postgres"),
+        POSTGRES_PASSWORD=os.getenv("POSTGRES_PASSWORD", "postgres"),
+        POSTGRES_FALLBACK_HOSTS=tuple(
+            host.strip() for host in os.getenv("POSTGRES_FALLBACK_HOSTS", "").split(",") if host.strip()
+        ),
+        POSTGRES_POOL_MINCONN=int(os.getenv("POSTGRES_POOL_MINCONN", "2")),
+        POSTGRES_POOL_MAXCONN=int(os.getenv("POSTGRES_POOL_MAXCONN", "10")),
+        SQL_MAX_ROWS=int(os.getenv("SQL_MAX_ROWS", "1000")),
+        QDRANT_HOST=os.getenv("QDRANT_HOST", "qdrant"),
+        QDRANT_PORT=int(os.getenv("QDRANT_PORT", "6333")),
+        QDRANT_URL=os.getenv("QDRANT_URL", "http://qdrant:6333"),
+        CHUNK_SIZE=int(os.getenv("CHUNK_SIZE", "1000")),
+        CHUNK_OVERLAP=int(os.getenv("CHUNK_OVERLAP", "100")),
+        DEFAULT_TOP_K=int(os.getenv("DEFAULT_TOP_K", "10")),
+        DATA_DIR=os.getenv("DATA_DIR", "data"),
+        SERVER_NAME=os.getenv("SERVER_NAME", "mcp-query-server"),
+        SERVER_VERSION=os.getenv("SERVER_VERSION", "1.0.0"),
+        TRANSPORT_MODE=os.getenv("TRANSPORT_MODE", "hybrid"),
+    )
+
+# Resolved once per process
+CONFIG = _load_config()
 
 # =============================================================================
 # LLM MODELS
 # =============================================================================
 
 # OpenAI Models (from environment variables)
-OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
-OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+OPENAI_CHAT_MODEL = CONFIG.OPENAI_CHAT_MODEL
+OPENAI_EMBEDDING_MODEL = CONFIG.OPENAI_EMBEDDING_MODEL
 
 # =============================================================================
 # DATABASE CONFIGURATION
 # =============================================================================
 
 # PostgreSQL Configuration (from environment variables)
-POSTGRES_HOST = os.getenv("POSTGRES_HOST", "postgres")
-POSTGRES_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
-POSTGRES_DB = os.getenv("POSTGRES_DB", "camera_feeds")
-POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres")
-POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
+POSTGRES_HOST = CONFIG.POSTGRES_HOST
+POSTGRES_PORT = CONFIG.POSTGRES_PORT
+POSTGRES_DB = CONFIG.POSTGRES_DB
+POSTGRES_USER = CONFIG.POSTGRES_USER
+POSTGRES_PASSWORD = CONFIG.POSTGRES_PASSWORD
+
+# Database Connection Hosts (POSTGRES_HOST, then any explicit POSTGRES_FALLBACK_HOSTS)
+POSTGRES_URLS = [POSTGRES_HOST, *CONFIG.POSTGRES_FALLBACK_HOSTS]
+POSTGRES_CONNECT_TIMEOUT = 2  # seconds, so a dead host fails fast
 
-# Database Connection URLs (for fallback)
-POSTGRES_URLS = ["postgres", "localhost"]
+# Connection Pool Sizing (from environment variables, match uvicorn workers/threads)
+POSTGRES_POOL_MINCONN = CONFIG.POSTGRES_POOL_MINCONN
+POSTGRES_POOL_MAXCONN = CONFIG.POSTGRES_POOL_MAXCONN
+
+# SQL Tool Result Streaming (row cap from environment variables)
+SQL_MAX_ROWS = CONFIG.SQL_MAX_ROWS
+SQL_FETCH_BATCH = 1000
 
 # =============================================================================
 # QDRANT CONFIGURATION
 # =============================================================================
 
 # Qdrant Configuration (from environment variables)
-QDRANT_HOST = os.getenv("QDRANT_HOST", "qdrant")
-QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_HOST = CONFIG.QDRANT_HOST
+QDRANT_PORT = CONFIG.QDRANT_PORT
 QDRANT_COLLECTION_NAME = "camera_data_chunks"
 
 # Qdrant URLs (for fallback)
-QDRANT_URLS = [os.getenv("QDRANT_URL", "http://qdrant:6333"), "http://localhost:6333"]
+QDRANT_URLS = [CONFIG.QDRANT_URL, "http://localhost:6333"]
 
 # =============================================================================
 # RAG CONFIGURATION
 # =============================================================================
 
 # Text Chunking Configuration (from environment variables)
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+CHUNK_SIZE = CONFIG.CHUNK_SIZE
+CHUNK_OVERLAP = CONFIG.CHUNK_OVERLAP
 CHUNK_SEPARATORS = ["\n\n", "\n", " ", ""]
 
+# Rows per CSV batch fed to the splitter (caps resident memory while loading)
+CSV_BATCH_ROWS = 10_000
+
 # Retrieval Configuration (from environment variables)
-DEFAULT_TOP_K = int(os.getenv("DEFAULT_TOP_K", "10"))
+DEFAULT_TOP_K = CONFIG.DEFAULT_TOP_K
 MAX_TOP_K = 20
 
 # =============================================================================
@@ -62,18 +140,22 @@ MAX_TOP_K = 20
 # =============================================================================
 
 # Data Directory (from environment variables)
-DATA_DIR = os.getenv("DATA_DIR", "data")
+DATA_DIR = CONFIG.DATA_DIR
 
 # Supported File Types
 SUPPORTED_FILE_TYPES = ["*.csv", "*.xlsx", "*.xls", "*.json"]
 
+# Chunked corpus cache file prefix (written inside DATA_DIR)
+CORPUS_CACHE_PREFIX = ".rag_chunks."
+
 # =============================================================================
 # SERVER CONFIGURATION
 # =============================================================================
 
 # MCP Server Configuration (from environment variables)
-SERVER_NAME = os.getenv("SERVER_NAME", "mcp-query-server")
-SERVER_VERSION = os.getenv("SERVER_VERSION", "1.0.0")
+SERVER_NAME = CONFIG.SERVER_NAME
+SERVER_VERSION = CONFIG.SERVER_VERSION
+TRANSPORT_MODE = CONFIG.TRANSPORT_MODE
 
 # =============================================================================
 # ERROR MESSAGES
@@ -4,78 +4,106 @@ Database utilities - Connection management and data loading
 """
 
 # Standard library imports
+import hashlib
+import io
 import os
+import threading
+from contextlib import contextmanager
 from typing import Optional
 
 # Third-party imports
 import pandas as pd
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
 # Local imports
 from constants import (
     POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB, 
     POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_URLS,
+    POSTGRES_POOL_MINCONN, POSTGRES_POOL_MAXCONN, POSTGRES_CONNECT_TIMEOUT,
     DB_CONNECTION_ERROR
 )
 
 # =============================================================================
-# DATABASE CONNECTION (SINGLETON)
+# DATABASE CONNECTION POOL (SINGLETON)
 # =============================================================================
 
 class DatabaseConnection:
-    """Singleton database connection manager"""
+    """Singleton database connection pool manager"""
     _instance = None
-    _connection = None
+    _pool = None
+    _lock = threading.Lock()
+    # getconn() raises PoolError when every connection is out; callers wait here instead
+    _slots = threading.BoundedSemaphore(POSTGRES_POOL_MAXCONN)
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseConnection, cls).__new__(cls)
         return cls._instance
     
-    def get_connection(self):
-        """Get or create database connection"""
-        if self._connection is None or self._connection.closed:
-            self._connection = self._create_connection()
-        return self._connection
+    def get_pool(self):
+        """Get or create the database connection pool"""
+        if self._pool is None or self._pool.closed:
+            with self._lock:
+                if self._pool is None or self._pool.closed:
+                    self._pool = self._create_connection()
+        return self._pool
     
     def _create_connection(self):
-        """Create new database connection"""
-        try:
-            # Try Docker service name first, then localhost
-            for host in POSTGRES_URLS:
-                try:
-                    conn = psycopg2.connect(
-                        host=host,
-                        port=POSTGRES_PORT,
-                        database=POSTGRES_DB,
-                        user=POSTGRES_USER,
-                        password=POSTGRES_PASSWORD
-                    )
-                    print(f"Connected to PostgreSQL at {host}:{POSTGRES_PORT}")
-                    return conn
-                except:
-                    continue
-            
-            print(DB_CONNECTION_ERROR)
-            return None
-        except Exception as e:
-            print(f"Database connection error: {e}")
-            return None
+        """Create new database connection pool"""
+        # POSTGRES_HOST first, then any explicitly configured fallback hosts
+        for host in POSTGRES_URLS:
+            try:
+                pool = ThreadedConnectionPool(
+                    minconn=POSTGRES_POOL_MINCONN,
+                    maxconn=POSTGRES_POOL_MAXCONN,
+                    host=host,
+                    port=POSTGRES_PORT,
+                    database=POSTGRES_DB,
+                    user=POSTGRES_USER,
+                    password=POSTGRES_PASSWORD,
+                    connect_timeout=POSTGRES_CONNECT_TIMEOUT
+                )
+                print(f"Connected to PostgreSQL at {host}:{POSTGRES_PORT} "
+                      f"(pool {POSTGRES_POOL_MINCONN}-{POSTGRES_POOL_MAXCONN})")
+                return pool
+            except psycopg2.OperationalError as e:
+                print(f"Database connection error at {host}:{POSTGRES_PORT}: {e}")
+        
+        print(DB_CONNECTION_ERROR)
+        return None
+    
+    @contextmanager
+    def acquire(self):
+        """Borrow a pooled connection, waiting for one if all are in use;
+        commit on success, roll back on error. Yields None if the database is unreachable."""
+        pool = self.get_pool()
+        if pool is None:
+            yield None
+            return
+        
+        with self._slots:
+            conn = pool.getconn()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                pool.putconn(conn)
     
     def close_connection(self):
-        """Close database connection"""
-        if self._connection and not self._connection.closed:
-            self._connection.close()
-            self._connection = None
+        """Close all pooled database connections"""
+        if self._pool and not self._pool.closed:
+            self._pool.closeall()
+            self._pool = None
 
 # Global database connection instance
 db_connection = DatabaseConnection()
 
-def get_db_connection():
-    """Get database connection (singleton)"""
-    return db_connection.get_connection()
-
 # =============================================================================
 # DATABASE INITIALIZATION
 # =============================================================================
@@ -83,12 +111,6 @@ def get_db_connection():
 def create_tables():
     """Create database tables if they don't exist"""
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        
-        cursor = conn.cursor()
-        
         # Create table if not exists
         create_table_sql = """
         CREATE TABLE IF NOT EXISTS camera_feeds (
@@ -103,10 +125,17 @@ def create_tables():
             modl_tag VARCHAR(50),
             civ_ok BOOLEAN
         );
+        CREATE TABLE IF NOT EXISTS etl_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
         """
-        cursor.execute(create_table_sql)
-        conn.commit()
-        cursor.close()
+        with db_connection.acquire() as conn:
+            if conn is None:
+                return False
+            
+            with conn.cursor() as cursor:
+                cursor.execute(create_table_sql)
         
         print("Database tables created successfully")
         return True
@@ -115,8 +144,20 @@ def create_tables():
         print(f"Error creating tables: {e}")
         return False
 
-def load_csv_to_database(csv_file_path: str = "/app/db-data/Table_feeds_v2.csv"):
-    """Load CSV data into PostgreSQL database (preload function)"""
+CAMERA_FEED_COLUMNS = (
+    "feed_id, theater, frrate, res_w, res_h, codec, encr, lat_ms, modl_tag, civ_ok"
+)
+
+# etl_state key holding the sha256 of the last loaded camera feeds CSV
+CSV_HASH_STATE_KEY = "camera_feeds_csv_sha256"
+
+def load_csv_to_database(csv_file_path: str = "/app/db-data/Table_feeds_v2.csv", replace: bool = True):
+    """Load CSV data into PostgreSQL database (preload function)
+    
+    replace=True clears the table and bulk-loads with a single COPY;
+    replace=False upserts the rows in pages via execute_values.
+    Skipped entirely when the CSV hash matches the one recorded in etl_state.
+    """
     try:
         print(f"Attempting to load CSV from: {csv_file_path}")
         
@@ -126,49 +167,76 @@ def load_csv_to_database(csv_file_path: str = "/app/db-data/Table_feeds_v2.csv")
             print(f"ERROR: CSV file not found at {csv_file_path}")
             return False
         
-        # Read CSV file
-        df = pd.read_csv(csv_file_path)
-        print(f"Loaded CSV with {len(df)} rows and {len(df.columns)} columns")
-        print(f"CSV columns: {list(df.columns)}")
-        
-        # Get database connection
-        print("Getting database connection...")
-        conn = get_db_connection()
-        if conn is None:
-            print("ERROR: Could not connect to database")
-            return False
+        # Read CSV bytes once and fingerprint them
+        with open(csv_file_path, "rb") as file:
+            csv_bytes = file.read()
+        csv_hash = hashlib.sha256(csv_bytes).hexdigest()
         
-        cursor = conn.cursor()
-        print("Database connection established")
-        
-        # Clear existing data
-        print("Clearing existing data from camera_feeds table...")
-        cursor.execute("DELETE FROM camera_feeds;")
-        
-        # Insert data
-        print(f"Inserting {len(df)} records into database...")
-        for i, (_, row) in enumerate(df.iterrows()):
-            if i % 10 == 0:  # Print progress every 10 records
-                print(f"Inserting record {i+1}/{len(df)}")
-            insert_sql = """
-            INSERT INTO camera_feeds 
-            (feed_id, theater, frrate, res_w, res_h, codec, encr, lat_ms, modl_tag, civ_ok)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (feed_id) DO UPDATE SET
-                theater = EXCLUDED.theater,
-                frrate = EXCLUDED.frrate,
-                res_w = EXCLUDED.res_w,
-                res_h = EXCLUDED.res_h,
-                codec = EXCLUDED.codec,
-                encr = EXCLUDED.encr,
-                lat_ms = EXCLUDED.lat_ms,
-                modl_tag = EXCLUDED.modl_tag,
-                civ_ok = EXCLUDED.civ_ok;
-            """
-            cursor.execute(insert_sql, tuple(row))
+        upsert_sql = f"""
+        INSERT INTO camera_feeds ({CAMERA_FEED_COLUMNS})
+        VALUES %s
+        ON CONFLICT (feed_id) DO UPDATE SET
+            theater = EXCLUDED.theater,
+            frrate = EXCLUDED.frrate,
+            res_w = EXCLUDED.res_w,
+            res_h = EXCLUDED.res_h,
+            codec = EXCLUDED.codec,
+            encr = EXCLUDED.encr,
+            lat_ms = EXCLUDED.lat_ms,
+            modl_tag = EXCLUDED.modl_tag,
+            civ_ok = EXCLUDED.civ_ok;
+        """
         
-        conn.commit()
-        cursor.close()
+        # Get database connection (committed when the block exits cleanly)
+        print("Getting database connection...")
+        with db_connection.acquire() as conn:
+            if conn is None:
+                print("ERROR: Could not connect to database")
+                return False
+            
+            cursor = conn.cursor()
+            print("Database connection established")
+            
+            # Short-circuit when this exact CSV is already loaded
+            cursor.execute("SELECT value FROM etl_state WHERE key = %s;", (CSV_HASH_STATE_KEY,))
+            state = cursor.fetchone()
+            if state is not None and state[0] == csv_hash:
+                cursor.close()
+                print("CSV unchanged since last load, skipping camera_feeds reload")
+                return True
+            
+            df = pd.read_csv(io.BytesIO(csv_bytes))
+            print(f"Loaded CSV with {len(df)} rows and {len(df.columns)} columns")
+            print(f"CSV columns: {list(df.columns)}")
+            
+            # Reload and record the new hash in the same transaction; the load is
+            # re-runnable from the CSV, so its commit need not wait for the WAL flush
+            cursor.execute("SET LOCAL synchronous_commit TO OFF;")
+            if replace:
+                # Cold load: clear the table and stream every row in one COPY
+                print("Clearing existing data from camera_feeds table...")
+                cursor.execute("TRUNCATE camera_feeds;")
+                
+                print(f"Copying {len(df)} records into database...")
+                cursor.copy_expert(
+                    f"COPY camera_feeds ({CAMERA_FEED_COLUMNS}) FROM STDIN WITH CSV",
+                    io.StringIO(df.to_csv(index=False, header=False))
+                )
+            else:
+                # Incremental load: upsert in pages of 1000 rows per statement
+                print(f"Upserting {len(df)} records into database...")
+                execute_values(
+                    cursor, upsert_sql,
+                    df.itertuples(index=False, name=None),
+                    page_size=1000
+                )
+            
+            cursor.execute(
+                "INSERT INTO etl_state (key, value) VALUES (%s, %s) "
+                "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value;",
+                (CSV_HASH_STATE_KEY, csv_hash)
+            )
+            cursor.close()
         
         print(f"Successfully loaded {len(df)} records into camera_feeds table")
         return True
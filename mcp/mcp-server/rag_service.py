@@ -4,15 +4,21 @@ RAG Utilities - Data loading, chunking, and vector store management
 """
 
 # Standard library imports
-import json
+import hashlib
 import os
+import pickle
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 
 # Third-party imports
+import orjson
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
 
 # LangChain imports
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -27,116 +33,203 @@ from langchain.prompts import PromptTemplate
 from constants import (
     OPENAI_CHAT_MODEL, OPENAI_EMBEDDING_MODEL,
     QDRANT_URLS, QDRANT_COLLECTION_NAME,
-    CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_SEPARATORS,
-    DEFAULT_TOP_K, DATA_DIR, SUPPORTED_FILE_TYPES,
-    NO_DATA_FILES, DATA_LOAD_ERROR
+    CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_SEPARATORS, CSV_BATCH_ROWS,
+    DEFAULT_TOP_K, MAX_TOP_K, DATA_DIR, SUPPORTED_FILE_TYPES,
+    CORPUS_CACHE_PREFIX, NO_DATA_FILES, DATA_LOAD_ERROR
 )
 
 # =============================================================================
 # DATA LOADING & CHUNKING
 # =============================================================================
 
-def load_data_from_directory(data_dir: str) -> List[str]:
-    """Load all supported files from data directory and return as text chunks"""
-    texts = []
+def load_data_from_directory(data_dir: str) -> Iterator[str]:
+    """Lazily yield text batches from all supported files in data directory"""
     data_path = Path(data_dir)
     
     if not data_path.exists():
         print(f"Data directory {data_dir} does not exist")
-        return texts
+        return
 
     # Load all supported file types
     for pattern in SUPPORTED_FILE_TYPES:
         for file_path in data_path.glob(pattern):
-            texts.extend(load_from_file(str(file_path)))
+            yield from load_from_file(str(file_path))
 
-    return texts
-
-def load_from_file(file_path: str) -> List[str]:
-    """Load data from a single file (CSV, XLSX, JSON)"""
-    texts = []
+def load_from_file(file_path: str) -> Iterator[str]:
+    """Lazily yield text batches from a single file (CSV, XLSX, JSON)"""
     path = Path(file_path)
     
     if not path.exists():
-        return texts
+        return
     
     try:
         if path.suffix.lower() == '.csv':
-            df = pd.read_csv(path)
-            texts.append(f"File: {path.name}\n{df.to_csv(index=False)}")
+            # Stream CSV rows in batches so only one batch is resident at a time
+            for batch in pd.read_csv(path, chunksize=CSV_BATCH_ROWS):
+                yield f"File: {path.name}\n{batch.to_csv(index=False)}"
         elif path.suffix.lower() in ['.xlsx', '.xls']:
-            df = pd.read_excel(path)
-            texts.append(f"File: {path.name}\n{df.to_csv(index=False)}")
+            # calamine (Rust) parses workbooks far faster than openpyxl;
+            # emit row batches rather than one monolithic CSV string
+            df = pd.read_excel(path, engine="calamine")
+            for start in range(0, len(df), CSV_BATCH_ROWS):
+                batch = df.iloc[start:start + CSV_BATCH_ROWS]
+                yield f"File: {path.name}\n{batch.to_csv(index=False)}"
         elif path.suffix.lower() == '.json':
-            with open(path, 'r') as file:
-                data = json.load(file)
-            texts.append(f"File: {path.name}\n{json.dumps(data, indent=2)}")
+            with open(path, 'rb') as file:
+                data = orjson.loads(file.read())
+            yield f"File: {path.name}\n{orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()}"
         
         print(f"Loaded {path.suffix.upper()}: {path.name}")
     except Exception as e:
         print(f"{DATA_LOAD_ERROR}: {path.name}: {e}")
-    
-    return texts
 
-def chunk_texts(texts: List[str]) -> List[Document]:
-    """Split texts into smaller chunks for better embeddings"""
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
-        length_function=len, separators=CHUNK_SEPARATORS
-    )
-    docs = splitter.create_documents(texts)
+# Splitter settings are fixed constants, so one instance serves every batch
+_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+    length_function=len, separators=CHUNK_SEPARATORS
+)
+
+def chunk_texts(texts: Iterable[str]) -> List[Document]:
+    """Split texts into smaller chunks for better embeddings, one batch at a time"""
+    docs = []
+    for text in texts:
+        docs.extend(_SPLITTER.create_documents([text]))
     print(f"Created {len(docs)} text chunks")
     return docs
 
+def _corpus_cache_key(data_path: Path) -> str:
+    """Hash data file paths + mtimes and chunking settings into a cache key"""
+    files = sorted(p for pattern in SUPPORTED_FILE_TYPES for p in data_path.glob(pattern))
+    fingerprint = b"|".join(f"{p}:{p.stat().st_mtime_ns}".encode() for p in files)
+    fingerprint += f"|{CHUNK_SIZE}:{CHUNK_OVERLAP}".encode()
+    return hashlib.sha256(fingerprint).hexdigest()
+
+def load_chunked_corpus(data_dir: str) -> List[Document]:
+    """Load and chunk the data directory, reusing an on-disk pickle while files are unchanged"""
+    data_path = Path(data_dir)
+    if not data_path.exists():
+        print(f"Data directory {data_dir} does not exist")
+        return []
+    
+    cache_path = data_path / f"{CORPUS_CACHE_PREFIX}{_corpus_cache_key(data_path)}.pkl"
+    if cache_path.exists():
+        try:
+            with open(cache_path, "rb") as file:
+                docs = pickle.load(file)
+            print(f"Loaded {len(docs)} cached text chunks from {cache_path.name}")
+            return docs
+        except Exception as e:
+            print(f"Ignoring unreadable chunk cache {cache_path.name}: {e}")
+    
+    docs = chunk_texts(load_data_from_directory(data_dir))
+    if docs:
+        try:
+            # Write atomically, then drop caches for older file versions
+            tmp_path = cache_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as file:
+                pickle.dump(docs, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+            for stale in data_path.glob(f"{CORPUS_CACHE_PREFIX}*.pkl"):
+                if stale != cache_path:
+                    stale.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Could not write chunk cache {cache_path.name}: {e}")
+    return docs
+
 # =============================================================================
 # QDRANT VECTOR STORE
 # =============================================================================
 
+# Shared HTTP session so URL probes reuse keep-alive sockets
+_HTTP = requests.Session()
+_HTTP.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_HTTP.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Shared Qdrant client (created lazily for the current Qdrant URL)
+_QDRANT_CLIENT = None
+_QDRANT_CLIENT_URL = None
+_qdrant_client_lock = threading.Lock()
+
+# Texts sent to the embeddings API per request
+EMBEDDING_BATCH_SIZE = 1000
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> OpenAIEmbeddings:
+    """Get the shared OpenAI embeddings client (created once per process)"""
+    return OpenAIEmbeddings(
+        model=OPENAI_EMBEDDING_MODEL, chunk_size=EMBEDDING_BATCH_SIZE,
+        max_retries=6, show_progress_bar=False
+    )
+
+@lru_cache(maxsize=1)
 def get_qdrant_url() -> str:
-    """Get Qdrant URL - try Docker first, then localhost"""
+    """Get Qdrant URL - try Docker first, then localhost (probed once per process)"""
     for url in QDRANT_URLS:
         try:
-            response = requests.get(f"{url}/collections", timeout=2)
+            response = _HTTP.get(f"{url}/collections", timeout=2)
             if response.status_code == 200:
                 return url
         except:
             continue
     return QDRANT_URLS[-1]  # fallback to last URL
 
+def _get_qdrant_client() -> QdrantClient:
+    """Get the shared Qdrant client, recreating it only if the Qdrant URL changed"""
+    global _QDRANT_CLIENT, _QDRANT_CLIENT_URL
+    qdrant_url = get_qdrant_url()
+    with _qdrant_client_lock:
+        if _QDRANT_CLIENT is None or _QDRANT_CLIENT_URL != qdrant_url:
+            _QDRANT_CLIENT = QdrantClient(url=qdrant_url)
+            _QDRANT_CLIENT_URL = qdrant_url
+        return _QDRANT_CLIENT
+
+@lru_cache(maxsize=1)
+def collection_exists(qdrant_url: str, collection_name: str) -> bool:
+    """Check whether a Qdrant collection exists with a single lookup (cached per process)"""
+    client = _get_qdrant_client()
+    try:
+        client.get_collection(collection_name)
+        return True
+    except UnexpectedResponse as e:
+        if e.status_code == 404:
+            return False
+        raise
+
 def build_vectorstore(docs: List[Document]) -> Qdrant:
     """Build Qdrant vector store from documents"""
     try:
-        embeddings = OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL)
+        embeddings = get_embeddings()
         collection_name = QDRANT_COLLECTION_NAME
         qdrant_url = get_qdrant_url()
         
+        # Embed and upsert in large batches: ceil(N / batch) API calls
         vectorstore = Qdrant.from_documents(
             docs, embeddings, url=qdrant_url,
-            collection_name=collection_name, force_recreate=True
+            collection_name=collection_name, force_recreate=True,
+            batch_size=EMBEDDING_BATCH_SIZE
         )
         
+        collection_exists.cache_clear()  # collection was just (re)created
         print(f"Qdrant vector store built with {len(docs)} documents at {qdrant_url}")
         return vectorstore
     except Exception as e:
         print(f"Error building Qdrant vector store: {e}")
+        get_qdrant_url.cache_clear()  # re-probe Qdrant URL on next attempt
         raise
 
 def load_existing_vectorstore() -> Qdrant:
     """Load existing Qdrant collection"""
     try:
-        embeddings = OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL)
+        embeddings = get_embeddings()
         collection_name = QDRANT_COLLECTION_NAME
         qdrant_url = get_qdrant_url()
         
         # Check if collection exists first
-        client = QdrantClient(url=qdrant_url)
-        collections = client.get_collections()
-        collection_names = [col.name for col in collections.collections]
-        
-        if collection_name not in collection_names:
+        if not collection_exists(qdrant_url, collection_name):
             print(f"Collection {collection_name} does not exist, will create new one")
             return None
         
+        client = _get_qdrant_client()
         vectorstore = Qdrant(
             client=client,
             collection_name=collection_name, embeddings=embeddings
@@ -146,38 +239,15 @@ def load_existing_vectorstore() -> Qdrant:
         return vectorstore
     except Exception as e:
         print(f"Error loading existing Qdrant collection: {e}")
+        get_qdrant_url.cache_clear()  # re-probe Qdrant URL on next attempt
         return None
 
 # =============================================================================
 # RAG SYSTEM
 # =============================================================================
 
-# Global RAG instance
-_rag_instance = None
-
-def get_rag_instance() -> RetrievalQA:
-    """Get or create RAG instance"""
-    global _rag_instance
-    if _rag_instance is None:
-        # Try to load existing collection first
-        vectorstore = load_existing_vectorstore()
-        if vectorstore is None:
-            # Create new collection from data
-            print("Creating new RAG system from data...")
-            texts = load_data_from_directory(DATA_DIR)
-            if not texts:
-                print(NO_DATA_FILES)
-                return None
-            
-            docs = chunk_texts(texts)
-            vectorstore = build_vectorstore(docs)
-        
-        # Create RAG pipeline with custom prompt
-        retriever = vectorstore.as_retriever(search_kwargs={"k": DEFAULT_TOP_K})
-        llm = ChatOpenAI(model=OPENAI_CHAT_MODEL, temperature=0)
-        
-        # Custom prompt template for better responses
-        prompt_template = """Use the following pieces of context to answer the question at the end. 
+# Custom prompt template for better responses
+RAG_PROMPT_TEMPLATE = """Use the following pieces of context to answer the question at the end. 
         Analyze the provided context and infer relevant information from the available data fields and their descriptions.
         If asked about quality criteria, quality assessment, or how to determine quality, examine the context 
         to identify which fields might indicate quality and how they could be used for assessment.
@@ -188,16 +258,56 @@ def get_rag_instance() -> RetrievalQA:
         Question: {question}
         
         Answer: Based on the available data fields and their descriptions, provide a comprehensive answer."""
+
+RAG_PROMPT = PromptTemplate(
+    template=RAG_PROMPT_TEMPLATE, input_variables=["context", "question"]
+)
+
+# Shared vector store and LLM, plus one RAG chain per top_k
+_vectorstore = None
+_llm = None
+_rag_instances: Dict[int, RetrievalQA] = {}
+_rag_lock = threading.Lock()
+
+def _init_rag_components() -> bool:
+    """Load (or build) the vector store and LLM once; caller must hold _rag_lock"""
+    global _vectorstore, _llm
+    if _vectorstore is None:
+        # Try to load existing collection first
+        vectorstore = load_existing_vectorstore()
+        if vectorstore is None:
+            # Create new collection from data
+            print("Creating new RAG system from data...")
+            docs = load_chunked_corpus(DATA_DIR)
+            if not docs:
+                print(NO_DATA_FILES)
+                return False
+            
+            vectorstore = build_vectorstore(docs)
         
-        PROMPT = PromptTemplate(
-            template=prompt_template, input_variables=["context", "question"]
-        )
-        
-        _rag_instance = RetrievalQA.from_chain_type(
-            llm=llm, retriever=retriever, 
-            chain_type="stuff", return_source_documents=True,
-            chain_type_kwargs={"prompt": PROMPT}
-        )
+        _vectorstore = vectorstore
+        _llm = ChatOpenAI(model=OPENAI_CHAT_MODEL, temperature=0)
         print("RAG system ready!")
+    return True
+
+def get_rag_instance(top_k: int = DEFAULT_TOP_K) -> RetrievalQA:
+    """Get or create the RAG instance retrieving top_k documents (thread-safe)"""
+    top_k = max(1, min(top_k, MAX_TOP_K))
+    rag = _rag_instances.get(top_k)
+    if rag is None:
+        with _rag_lock:
+            rag = _rag_instances.get(top_k)
+            if rag is None:
+                if not _init_rag_components():
+                    return None
+                
+                # Create RAG pipeline with its own retriever, so k is never mutated on a shared chain
+                retriever = _vectorstore.as_retriever(search_kwargs={"k": top_k})
+                rag = RetrievalQA.from_chain_type(
+                    llm=_llm, retriever=retriever, 
+                    chain_type="stuff", return_source_documents=True,
+                    chain_type_kwargs={"prompt": RAG_PROMPT}
+                )
+                _rag_instances[top_k] = rag
     
-    return _rag_instance
+    return rag
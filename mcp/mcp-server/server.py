@@ -6,8 +6,6 @@ Hybrid MCP Server: Supports both stdio and HTTP transport
 
 import asyncio
 import json
-import sys
-import os
 from typing import Any, Dict, List
 
 from mcp.server import Server
@@ -27,22 +25,24 @@ from mcp.types import (
 
 # HTTP server imports
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
-import importlib.util
-import sys
 
-from tools import rag_query_tool, sql_query_tool
+from tools import rag_query_tool, sql_query_tool, get_db_service
 
-# Import database-service module (handling hyphen in filename)
-spec = importlib.util.spec_from_file_location("database_service", "database-service.py")
-database_service = importlib.util.module_from_spec(spec)
-sys.modules["database_service"] = database_service
-spec.loader.exec_module(database_service)
+# Import database-service module once (shared with the SQL tool)
+database_service = get_db_service()
 
 from config import MCP_TOOLS
-from constants import SERVER_NAME, SERVER_VERSION
+from constants import CONFIG, SERVER_NAME, SERVER_VERSION
+
+# Tool name -> callable taking the raw arguments dict (shared by both transports)
+TOOL_DISPATCH = {
+    "rag_query_tool": lambda args: rag_query_tool(args.get("query", ""), args.get("top_k", 5)),
+    "sql_query_tool": lambda args: sql_query_tool(args.get("query", "")),
+}
 
 # Create the MCP server instance
 mcp_server = Server(SERVER_NAME)
@@ -51,7 +51,8 @@ mcp_server = Server(SERVER_NAME)
 app = FastAPI(
     title=SERVER_NAME,
     version=SERVER_VERSION,
-    description="MCP Server for RAG Query Tool and SQL Query Tool"
+    description="MCP Server for RAG Query Tool and SQL Query Tool",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -78,90 +79,76 @@ class ToolInfo(BaseModel):
     description: str
     inputSchema: Dict[str, Any]
 
+# Tool listings and health payload are invariant, so build them once
+_TOOL_OBJS = [
+    Tool(
+        name=tool["name"],
+        description=tool["description"],
+        inputSchema=tool["inputSchema"]
+    )
+    for tool in MCP_TOOLS
+]
+_TOOL_INFOS = [ToolInfo(**tool) for tool in MCP_TOOLS]
+_ROOT_PAYLOAD = {
+    "server": SERVER_NAME,
+    "version": SERVER_VERSION,
+    "status": "healthy",
+    "tools": len(MCP_TOOLS),
+    "transport": "HTTP + MCP Stdio"
+}
+
 # MCP Server handlers
 @mcp_server.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """List available tools - MCP compliant"""
-    return [
-        Tool(
-            name=tool["name"],
-            description=tool["description"],
-            inputSchema=tool["inputSchema"]
-        )
-        for tool in MCP_TOOLS
-    ]
+    return _TOOL_OBJS
 
 @mcp_server.call_tool()
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """Handle tool calls - MCP compliant"""
-    if name == "rag_query_tool":
-        query = arguments.get("query", "")
-        top_k = arguments.get("top_k", 5)
-        
-        result = rag_query_tool(query, top_k)
-        return [TextContent(type="text", text=result)]
-    
-    elif name == "sql_query_tool":
-        query = arguments.get("query", "")
-        
-        result = sql_query_tool(query)
-        return [TextContent(type="text", text=result)]
-    
-    else:
+    tool_fn = TOOL_DISPATCH.get(name)
+    if tool_fn is None:
         raise ValueError(f"Unknown tool: {name}")
+    
+    # Tools do blocking network/DB I/O; keep the event loop free
+    result = await asyncio.to_thread(tool_fn, arguments)
+    return [TextContent(type="text", text=result)]
 
 # HTTP Server endpoints
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {
-        "server": SERVER_NAME,
-        "version": SERVER_VERSION,
-        "status": "healthy",
-        "tools": len(MCP_TOOLS),
-        "transport": "HTTP + MCP Stdio"
-    }
+    return _ROOT_PAYLOAD
 
 @app.get("/tools", response_model=List[ToolInfo])
 async def list_tools():
     """List available tools via HTTP"""
-    return [
-        ToolInfo(
-            name=tool["name"],
-            description=tool["description"],
-            inputSchema=tool["inputSchema"]
-        )
-        for tool in MCP_TOOLS
-    ]
-
-@app.post("/tools/call", response_model=ToolCallResponse)
+    return _TOOL_INFOS
+
+def tool_call_response(result: str, success: bool, error: str = None) -> ORJSONResponse:
+    """Serialize a ToolCallResponse-shaped payload directly, skipping model validation"""
+    return ORJSONResponse({"result": result, "success": success, "error": error})
+
+# ToolCallResponse is kept for the OpenAPI schema only; the (possibly large)
+# result string is not re-validated on every response
+@app.post(
+    "/tools/call",
+    response_model=None,
+    responses={200: {"model": ToolCallResponse}}
+)
 async def call_tool(request: ToolCallRequest):
     """Call a tool with given arguments via HTTP"""
     try:
-        if request.name == "rag_query_tool":
-            query = request.arguments.get("query", "")
-            top_k = request.arguments.get("top_k", 5)
-            result = rag_query_tool(query, top_k)
-            return ToolCallResponse(result=result, success=True)
-        
-        elif request.name == "sql_query_tool":
-            query = request.arguments.get("query", "")
-            result = sql_query_tool(query)
-            return ToolCallResponse(result=result, success=True)
+        tool_fn = TOOL_DISPATCH.get(request.name)
+        if tool_fn is None:
+            return tool_call_response("", False, f"Unknown tool: {request.name}")
         
-        else:
-            return ToolCallResponse(
-                result="",
-                success=False,
-                error=f"Unknown tool: {request.name}"
-            )
+        # Tools do blocking network/DB I/O; keep the event loop free
+        result = await asyncio.to_thread(tool_fn, request.arguments)
+        return tool_call_response(result, True)
     
     except Exception as e:
-        return ToolCallResponse(
-            result="",
-            success=False,
-            error=str(e)
-        )
+        return tool_call_response("", False, str(e))
 
 async def run_mcp_stdio():
     """Run MCP server with stdio transport"""
@@ -200,8 +187,8 @@ async def main():
     database_service.initialize_database()
     print("MCP Server ready!")
     
-    # Check transport mode from environment
-    transport_mode = os.getenv("TRANSPORT_MODE", "hybrid")
+    # Check transport mode from resolved config
+    transport_mode = CONFIG.TRANSPORT_MODE
     print(f"Transport mode: {transport_mode}")
     
     if transport_mode == "http":
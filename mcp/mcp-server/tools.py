@@ -6,11 +6,34 @@ Goal: Store chunks from data files to Qdrant as vector embeddings and query them
 
 # Standard library imports
 import importlib.util
+import io
+import os
+import re
 import sys
+from functools import lru_cache
 from typing import List, Dict, Any
 
 # Local imports
-from constants import RAG_NOT_INITIALIZED, RAG_QUERY_ERROR, DB_CONNECTION_ERROR, DB_QUERY_ERROR
+from constants import (
+    RAG_NOT_INITIALIZED, RAG_QUERY_ERROR, DB_CONNECTION_ERROR, DB_QUERY_ERROR,
+    SQL_MAX_ROWS, SQL_FETCH_BATCH
+)
+
+# =============================================================================
+# DATABASE SERVICE
+# =============================================================================
+
+@lru_cache(maxsize=1)
+def get_db_service():
+    """Load database-service.py once (hyphen in filename) and reuse the module"""
+    database_service = sys.modules.get("database_service")
+    if database_service is None:
+        module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database-service.py")
+        spec = importlib.util.spec_from_file_location("database_service", module_path)
+        database_service = importlib.util.module_from_spec(spec)
+        sys.modules["database_service"] = database_service
+        spec.loader.exec_module(database_service)
+    return database_service
 
 # =============================================================================
 # RAG QUERY TOOL
@@ -23,13 +46,10 @@ def rag_query_tool(query: str, top_k: int = 5) -> str:
     """
     try:
         from rag_service import get_rag_instance
-        rag = get_rag_instance()
+        rag = get_rag_instance(top_k)
         if rag is None:
             return f"Error: {RAG_NOT_INITIALIZED}"
         
-        # Update retriever k value
-        rag.retriever.search_kwargs["k"] = top_k
-        
         result = rag({"query": query})
         
         answer = result["result"]
@@ -37,9 +57,9 @@ def rag_query_tool(query: str, top_k: int = 5) -> str:
         
         response = f"Answer: {answer}\n\n"
         if sources:
-            response += "Sources:\n"
-            for i, source in enumerate(sources, 1):
-                response += f"{i}. {source.page_content}\n"
+            response += "Sources:\n" + "".join(
+                f"{i}. {source.page_content}\n" for i, source in enumerate(sources, 1)
+            )
         
         return response
         
@@ -50,49 +70,74 @@ def rag_query_tool(query: str, top_k: int = 5) -> str:
 # SQL QUERY TOOL
 # =============================================================================
 
+# Data-modifying statements, which must not run on a server-side cursor
+_DML_RE = re.compile(r'\b(insert|update|delete|merge)\b')
+
+def is_streamable_query(query: str) -> bool:
+    """True for read-only queries: plain SELECTs, or WITH queries with no DML"""
+    statement = query.lstrip().lower()
+    if statement.startswith("select"):
+        return True
+    return statement.startswith("with") and not _DML_RE.search(statement)
+
 def sql_query_tool(query: str) -> str:
     """
     MCP Tool: Execute SQL query on camera feeds database
     Returns: Query results as formatted string
     """
     try:
-        # Import database-service module (handling hyphen in filename)
-        spec = importlib.util.spec_from_file_location("database_service", "database-service.py")
-        database_service = importlib.util.module_from_spec(spec)
-        sys.modules["database_service"] = database_service
-        spec.loader.exec_module(database_service)
-        
-        conn = database_service.get_db_connection()
-        if conn is None:
-            return f"Error: {DB_CONNECTION_ERROR}"
-        
-        cursor = conn.cursor()
-        cursor.execute(query)
-        
-        # Get column names
-        columns = [desc[0] for desc in cursor.description]
-        
-        # Get results
-        results = cursor.fetchall()
-        
-        cursor.close()
-        
-        if not results:
+        with get_db_service().db_connection.acquire() as conn:
+            if conn is None:
+                return f"Error: {DB_CONNECTION_ERROR}"
+            
+            # Stream read-only queries from a server-side cursor; anything that may
+            # modify data (including WITH ... INSERT/UPDATE/DELETE) uses a plain cursor
+            if is_streamable_query(query):
+                cursor = conn.cursor(name="sql_tool")
+                cursor.execute(query)
+            else:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                # Statements without RETURNING produce no result set
+                if cursor.description is None:
+                    cursor.close()
+                    return "Query executed successfully. No results returned."
+            
+            # Write rows into a buffer batch by batch, up to SQL_MAX_ROWS
+            rows_buf = io.StringIO()
+            row_count = 0
+            while row_count < SQL_MAX_ROWS:
+                rows = cursor.fetchmany(min(SQL_FETCH_BATCH, SQL_MAX_ROWS - row_count))
+                if not rows:
+                    break
+                for row in rows:
+                    rows_buf.write(" | ".join(map(str, row)))
+                    rows_buf.write("\n")
+                row_count += len(rows)
+            truncated = row_count >= SQL_MAX_ROWS and cursor.fetchone() is not None
+            
+            # Get column names (set on named cursors once the first fetch runs)
+            columns = [desc[0] for desc in cursor.description]
+            
+            cursor.close()
+        
+        if not row_count:
             return "Query executed successfully. No results returned."
         
         # Format results
-        response = f"Query Results ({len(results)} rows):\n\n"
+        response = io.StringIO()
+        response.write(f"Query Results ({row_count} rows):\n\n")
         
         # Add column headers
-        response += " | ".join(columns) + "\n"
-        response += "-" * (len(" | ".join(columns))) + "\n"
+        header = " | ".join(columns)
+        response.write(f"{header}\n{'-' * len(header)}\n")
         
         # Add data rows
-        for row in results:
-            row_values = [str(value) for value in row]
-            response += " | ".join(row_values) + "\n"
+        response.write(rows_buf.getvalue())
+        if truncated:
+            response.write(f"... (truncated at {SQL_MAX_ROWS} rows)\n")
         
-        return response
+        return response.getvalue()
         
     except Exception as e:
         return f"{DB_QUERY_ERROR}: {str(e)}"
@@ -3,11 +3,23 @@
 Camera Feed Query System - FastAPI Server
 """
 
+import logging
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from controllers.health import router as health_router
-from controllers.chatbot_controller import router as chatbot_router
+
+# Routers to mount, e.g. ENABLED_ROUTERS="health" for a probe-only pod
+ENABLED_ROUTERS = {
+    name.strip() for name in os.getenv("ENABLED_ROUTERS", "health,chat").split(",") if name.strip()
+}
+
+# Service logs (set LOG_LEVEL=DEBUG for per-step tool traces)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -25,10 +37,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include routers
-app.include_router(health_router)
-app.include_router(chatbot_router, prefix="/api/v1", tags=["chatbot"])
+# Include routers (imported only when enabled, so skipped ones never load their services)
+if "health" in ENABLED_ROUTERS:
+    from controllers.health import router as health_router
+    app.include_router(health_router)
+
+if "chat" in ENABLED_ROUTERS:
+    from controllers.chatbot_controller import router as chatbot_router
+    app.include_router(chatbot_router, prefix="/api/v1", tags=["chatbot"])
 
 if __name__ == "__main__":
+    # APP_RELOAD=1 is for local development only (spawns a file watcher + worker)
+    reload = os.getenv("APP_RELOAD", "0") == "1"
+    workers = 1 if reload else int(os.getenv("UVICORN_WORKERS", "1"))
+    
     print("Starting API server on http://localhost:8001")
-    uvicorn.run(app, host="0.0.0.0", port=8001, reload=False)
+    # uvicorn needs an import string when reloading or running several workers
+    uvicorn.run(
+        "application:app" if reload or workers > 1 else app,
+        host="0.0.0.0", port=8001,
+        reload=reload, workers=workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__))
+    )
@@ -3,12 +3,61 @@
 Chatbot Controller - Handles chatbot conversation endpoint using Graph Service
 """
 
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from src.models.query_models import QueryRequest, QueryResponse
 from src.services.graph_service import graph
 from langchain_core.messages import HumanMessage
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Per-thread locks: runs on different threads proceed concurrently, while messages
+# on the same thread are handled in arrival order so history stays consistent.
+# Entries are [lock, users] and are dropped once the last user leaves.
+_thread_locks: Dict[str, list] = {}
+
+
+@asynccontextmanager
+async def thread_turn(thread_id: str):
+    """Hold a conversation thread's lock, so its messages are handled one at a time"""
+    entry = _thread_locks.get(thread_id)
+    if entry is None:
+        entry = _thread_locks[thread_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _thread_locks[thread_id]
+
+
+async def run_graph(input_state, config):
+    """Run the graph in a worker thread, one request at a time per conversation thread"""
+    async with thread_turn(config["configurable"]["thread_id"]):
+        return await asyncio.to_thread(graph.invoke, input_state, config=config)
+
+
+async def stream_graph(input_state, config):
+    """Stream the graph's response text, holding the thread's turn until the stream ends"""
+    async with thread_turn(config["configurable"]["thread_id"]):
+        chunks = graph.stream(input_state, config=config)
+        try:
+            # Each step of the sync generator runs in a worker thread
+            while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                yield chunk
+        except Exception as e:
+            # Headers are already sent, so end the stream with the error instead of cutting it off
+            logger.error("❌ Error streaming message: %s", e)
+            yield f"\nError processing message: {str(e)}"
+
 
 @router.post("/chat", response_model=QueryResponse)
 async def send_message(request: QueryRequest):
@@ -24,15 +73,12 @@ async def send_message(request: QueryRequest):
         
         # Run the graph workflow with memory (thread_id passed via config)
         config = {"configurable": {"thread_id": thread_id}}
-        result = graph.invoke(input_state, config=config)
+        result = await run_graph(input_state, config)
         
-        # Extract the response from the last AI message
-        response_text = "No response generated"
-        if "messages" in result:
-            for msg in reversed(result["messages"]):
-                if hasattr(msg, 'content'):
-                    response_text = msg.content
-                    break
+        # Extract the response from the last message
+        messages = result.get("messages") or ()
+        last_message = messages[-1] if messages else None
+        response_text = getattr(last_message, "content", None) or "No response generated"
         
         return QueryResponse(
             response=response_text,
@@ -41,3 +87,19 @@ async def send_message(request: QueryRequest):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
+
+
+@router.post("/chat/stream")
+async def stream_message(request: QueryRequest):
+    """Send a message to the chatbot and stream the response text as it is generated"""
+    thread_id = request.thread_id or "default"
+    input_state = {
+        "messages": [HumanMessage(content=request.query)]
+    }
+    config = {"configurable": {"thread_id": thread_id}}
+    
+    return StreamingResponse(
+        stream_graph(input_state, config),
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Thread-Id": thread_id}
+    )
@@ -3,9 +3,10 @@
 Models package - Pydantic models for the Camera Feed Query System
 """
 
-from .query_models import QueryRequest, QueryResponse
+from .query_models import QueryRequest, QueryResponse, QueryPlan
 
 __all__ = [
     "QueryRequest",
-    "QueryResponse"
+    "QueryResponse",
+    "QueryPlan"
 ]
@@ -3,7 +3,7 @@
 Query-related Pydantic models
 """
 
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 from pydantic import BaseModel
 
 class QueryRequest(BaseModel):
@@ -13,3 +13,9 @@ class QueryRequest(BaseModel):
 class QueryResponse(BaseModel):
     response: str
     thread_id: str
+
+class QueryPlan(BaseModel):
+    intent: Literal["general_greeting", "data_query", "metadata_query"]
+    confidence: float = 0.9
+    reasoning: str = ""
+    sql: Optional[str] = None
@@ -3,16 +3,18 @@ Graph Service - LangGraph workflow builder
 Focuses only on graph construction and edge logic
 """
 
-import sys
-import os
+import functools
+import hashlib
+from contextlib import contextmanager
 from typing import Any
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from langchain_core.messages import AIMessage, HumanMessage
 from langgraph.graph import StateGraph, START, END
-from models.state_models import AgentState
-from typing import Dict, List
+from ..models.state_models import AgentState
+from typing import Deque, Dict, List, Union
+from collections import defaultdict, deque
 import threading
-from datetime import datetime
+import time
 
 # Import node and edge functions
 from .nodes import (
@@ -22,45 +24,66 @@ from .nodes import (
     route_after_start
 )
 
-# In-memory conversation storage
-conversation_memory: Dict[str, List[Dict[str, str]]] = {}
-memory_lock = threading.Lock()
+# In-memory conversation storage (bounded per thread, oldest messages drop off)
+MAX_MESSAGES_PER_THREAD = 50
+conversation_memory: Dict[Union[str, bytes], Deque[Dict[str, Any]]] = defaultdict(lambda: deque(maxlen=MAX_MESSAGES_PER_THREAD))
+memory_lock = threading.Lock()  # guards the per-thread lock map only
+# Per-thread locks as [lock, users]; an entry is dropped once its last user is done
+_thread_locks: Dict[Union[str, bytes], list] = {}
+
+def _k(thread_id: str) -> Union[str, bytes]:
+    """Memory key for a thread: long ids are hashed to a fixed 16-byte digest"""
+    return hashlib.blake2b(thread_id.encode(), digest_size=16).digest() if len(thread_id) > 16 else thread_id
+
+@contextmanager
+def _thread_lock(key: Union[str, bytes]):
+    """Hold the lock serializing access to one conversation thread"""
+    with memory_lock:
+        entry = _thread_locks.get(key)
+        if entry is None:
+            entry = _thread_locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with memory_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _thread_locks[key]
 
 def get_conversation_history(thread_id: str, limit: int = 20) -> List:
     """Get conversation history for a thread from in-memory storage"""
-    with memory_lock:
-        if thread_id not in conversation_memory:
-            return []
-        
-        # Get the last 'limit' messages
-        history = conversation_memory[thread_id][-limit:] if len(conversation_memory[thread_id]) > limit else conversation_memory[thread_id]
-        
-        # Convert to LangChain messages
-        from langchain_core.messages import HumanMessage, AIMessage
-        messages = []
-        for msg in history:
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                messages.append(AIMessage(content=msg["content"]))
-        
-        return messages
+    key = _k(thread_id)
+    thread_memory = conversation_memory.get(key)
+    if not thread_memory:
+        return []
+    
+    # Snapshot the deque under the thread lock (an append mid-copy would abort the
+    # iteration), then keep the last 'limit' messages
+    with _thread_lock(key):
+        history = list(thread_memory)[-limit:]
+    
+    # Convert to LangChain messages
+    messages = []
+    for msg in history:
+        if msg["role"] == "user":
+            messages.append(HumanMessage(content=msg["content"]))
+        elif msg["role"] == "assistant":
+            messages.append(AIMessage(content=msg["content"]))
+    
+    return messages
 
 def save_message(thread_id: str, role: str, content: str):
     """Save a message to the in-memory conversation history"""
-    with memory_lock:
-        if thread_id not in conversation_memory:
-            conversation_memory[thread_id] = []
-        
-        conversation_memory[thread_id].append({
+    # Only writers to the same thread contend; the deque drops the oldest message past its maxlen
+    key = _k(thread_id)
+    with _thread_lock(key):
+        conversation_memory[key].append({
             "role": role,
             "content": content,
-            "timestamp": str(datetime.now())
+            "timestamp": time.time()
         })
-        
-        # Keep only the last 50 messages per thread to prevent memory bloat
-        if len(conversation_memory[thread_id]) > 50:
-            conversation_memory[thread_id] = conversation_memory[thread_id][-50:]
 
 def build_graph() -> StateGraph:
     """Build and return the LangGraph workflow"""
@@ -101,8 +124,8 @@ class GraphWithMemory:
     def __init__(self, graph):
         self.graph = graph
     
-    def invoke(self, input_state, config=None):
-        """Invoke the graph with memory management"""
+    def _prepare(self, input_state, config=None):
+        """Record the user message and merge thread history into the input state"""
         # Extract thread_id from config
         thread_id = "default"
         if config and "configurable" in config and "thread_id" in config["configurable"]:
@@ -114,38 +137,97 @@ class GraphWithMemory:
         # Save the current user message to memory first
         if "messages" in input_state and input_state["messages"]:
             for msg in input_state["messages"]:
-                if hasattr(msg, 'content') and hasattr(msg, '__class__') and 'Human' in msg.__class__.__name__:
+                if isinstance(msg, HumanMessage):
                     save_message(thread_id, "user", msg.content)
         
         # Merge history with current messages
         if "messages" in input_state:
-            # Combine history with new messages
-            all_messages = history + input_state["messages"]
-            input_state["messages"] = all_messages
-        
-        # Run the graph
-        result = self.graph.invoke(input_state)
+            # Combine history with new messages (history is a fresh list, extend it in place)
+            history.extend(input_state["messages"])
+            input_state["messages"] = history
         
-        # Save the AI response to memory
+        return thread_id, input_state
+    
+    def _record(self, thread_id, result):
+        """Save the first AI response of a graph result to memory"""
         if "messages" in result:
             for msg in result["messages"]:
-                if hasattr(msg, 'content') and hasattr(msg, '__class__') and 'AI' in msg.__class__.__name__:
+                if isinstance(msg, AIMessage):
                     save_message(thread_id, "assistant", msg.content)
                     break  # Only save the first AI response
+    
+    def invoke(self, input_state, config=None):
+        """Invoke the graph with memory management"""
+        thread_id, input_state = self._prepare(input_state, config)
+        
+        # Run the graph
+        result = self.graph.invoke(input_state)
+        
+        # Save the AI response to memory
+        self._record(thread_id, result)
         
         return result
+    
+    def stream(self, input_state, config=None):
+        """Run the graph with memory management, yielding response text as it is generated"""
+        # Imported lazily, like the message classes in get_conversation_history
+        from .nodes import FINAL_RESPONSE_KEY
+        
+        thread_id, input_state = self._prepare(input_state, config)
+        
+        result = None
+        streamed = False
+        for mode, payload in self.graph.stream(input_state, stream_mode=["messages", "values"]):
+            if mode == "values":
+                result = payload
+                continue
+            chunk, metadata = payload
+            if metadata.get(FINAL_RESPONSE_KEY) and chunk.content:
+                streamed = True
+                yield chunk.content
+        
+        if result is None:
+            return
+        
+        # Answers that were not generated token by token (cache hits, RAG answers) arrive whole
+        if not streamed:
+            messages = result.get("messages") or ()
+            content = getattr(messages[-1], "content", None) if messages else None
+            if content:
+                yield content
+        
+        # Save the AI response to memory
+        self._record(thread_id, result)
 
+@functools.cache
 def create_graph() -> Any:
-    """Create and compile the graph with in-memory state management"""
+    """Create and compile the graph with in-memory state management (once per process)"""
     # Build and compile the graph
     graph_builder = build_graph()
     compiled_graph = graph_builder.compile()
     
     # Wrap with memory management
-    graph_with_memory = GraphWithMemory(compiled_graph)
-    print("Graph compiled successfully with in-memory state management")
-    return graph_with_memory
+    return GraphWithMemory(compiled_graph)
+
+
+# functools.cache may run create_graph twice under a race; the lock prevents a double compile
+_graph_lock = threading.Lock()
+
+def get_graph() -> Any:
+    """Get the compiled graph, compiling it on first use"""
+    with _graph_lock:
+        return create_graph()
+
+
+class _LazyGraph:
+    """Proxy that defers graph compilation until the graph is actually used"""
+    
+    def invoke(self, *args, **kwargs):
+        return get_graph().invoke(*args, **kwargs)
+    
+    def __getattr__(self, name):
+        return getattr(get_graph(), name)
 
 
-# Create default graph instance
-graph = create_graph()
+# Default graph instance (compiled on first invoke)
+graph = _LazyGraph()
@@ -3,8 +3,12 @@
 MCP Client - HTTP client to communicate with MCP RAG Query Server
 """
 
+import atexit
+import threading
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any, Optional
 
 class MCPClient:
@@ -12,6 +16,15 @@ class MCPClient:
     
     def __init__(self, base_url: str = "http://host.docker.internal:8000"):
         self.base_url = base_url.rstrip('/')
+        
+        # Pooled keep-alive session shared by every MCP call
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        ))
+        atexit.register(self.session.close)
     
     def rag_query(self, query: str, top_k: int = 5) -> Dict[str, Any]:
         """
@@ -34,7 +47,7 @@ class MCPClient:
                 }
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/tools/call",
                 json=payload,
                 timeout=30
@@ -68,7 +81,7 @@ class MCPClient:
                 }
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/tools/call",
                 json=payload,
                 timeout=30
@@ -86,12 +99,15 @@ class MCPClient:
 
 # Global client instance
 _mcp_client = None
+_mcp_client_lock = threading.Lock()
 
 def get_mcp_client(base_url: str = "http://host.docker.internal:8000") -> MCPClient:
     """Get or create MCP client instance"""
     global _mcp_client
     if _mcp_client is None:
-        _mcp_client = MCPClient(base_url)
+        with _mcp_client_lock:
+            if _mcp_client is None:
+                _mcp_client = MCPClient(base_url)
     return _mcp_client
 
 def rag_query_via_mcp(query: str, top_k: int = 5) -> str:
@@ -4,8 +4,12 @@ MCP Stdio Client - Direct communication with MCP server via stdio
 """
 
 import subprocess
-import json
+import orjson
 import os
+import itertools
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Dict, Any, Optional
 
 class MCPStdioClient:
@@ -14,52 +18,95 @@ class MCPStdioClient:
     def __init__(self, server_path: str = "../mcp/mcp-server/server.py"):
         self.server_path = server_path
         self.process = None
+        
+        # Pipelined requests: responses are matched to callers by id, and each
+        # server process gets its own pending map so a dead one only fails its own callers
+        self._next_id = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._reader = None
     
     def start_server(self):
         """Start the MCP server process"""
-        if self.process is None:
-            self.process = subprocess.Popen(
-                ["python", self.server_path],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=os.path.dirname(os.path.abspath(__file__))
-            )
+        with self._lock:
+            if self.process is None:
+                self.process = subprocess.Popen(
+                    ["python", self.server_path],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    cwd=os.path.dirname(os.path.abspath(__file__))
+                )
+                self._pending = {}
+                self._reader = threading.Thread(
+                    target=self._read_responses, args=(self.process, self._pending), daemon=True
+                )
+                self._reader.start()
     
     def stop_server(self):
         """Stop the MCP server process"""
-        if self.process:
-            self.process.terminate()
-            self.process.wait()
-            self.process = None
+        with self._lock:
+            process, self.process = self.process, None
+        if process:
+            process.terminate()
+            process.wait()
+    
+    def _read_responses(self, process, pending: Dict[int, Future]):
+        """Dispatch each response line from one server process to the future waiting on its id"""
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                response = orjson.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                future = pending.pop(response.get("id"), None)
+            if future is not None:
+                future.set_result(response)
+        
+        # Server exited: fail everything still waiting on this process
+        with self._lock:
+            orphaned = list(pending.values())
+            pending.clear()
+        for future in orphaned:
+            future.set_result({"error": "No response from server"})
     
-    def send_request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    def send_request(self, method: str, params: Dict[str, Any], timeout: float = 30) -> Dict[str, Any]:
         """Send a request to the MCP server"""
         if self.process is None:
             self.start_server()
         
+        request_id = next(self._next_id)
         request = {
             "jsonrpc": "2.0",
-            "id": 1,
+            "id": request_id,
             "method": method,
             "params": params
         }
         
+        future = Future()
+        pending = None
         try:
-            # Send request
-            self.process.stdin.write(json.dumps(request) + "\n")
-            self.process.stdin.flush()
+            # Send request (writes are serialized, responses may arrive in any order)
+            with self._lock:
+                pending = self._pending
+                pending[request_id] = future
+                self.process.stdin.write(orjson.dumps(request) + b"\n")
+                self.process.stdin.flush()
             
-            # Read response
-            response_line = self.process.stdout.readline()
-            if response_line:
-                return json.loads(response_line.strip())
-            else:
-                return {"error": "No response from server"}
+            # Wait for the matching response
+            return future.result(timeout=timeout)
                 
+        except FutureTimeoutError:
+            return {"error": "No response from server"}
         except Exception as e:
             return {"error": f"Communication error: {str(e)}"}
+        finally:
+            if pending is not None:
+                with self._lock:
+                    pending.pop(request_id, None)
     
     def rag_query(self, query: str, top_k: int = 5) -> Dict[str, Any]:
         """Query the RAG system via MCP server"""
@@ -3,15 +3,211 @@ Node Functions for LangGraph Workflow
 Contains all node and edge logic functions used in the graph
 """
 
-import sys
+import hashlib
+import logging
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import re
+import numpy as np
+import orjson
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Optional, Tuple
 
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, RemoveMessage
-from langchain_openai import ChatOpenAI
-from models.state_models import AgentState
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from ..models.state_models import AgentState
+from ..models.query_models import QueryPlan
 # Import MCP client to call MCP server tools
 from .mcp_client import rag_query_via_mcp, sql_query_via_mcp
+from .semantic_cache import get_semantic_cache
+
+logger = logging.getLogger(__name__)
+
+# Worker pool for overlapping independent LLM and MCP calls, sized like the
+# asyncio.to_thread pool the chat endpoint runs graphs on (one slot per graph run)
+_EXECUTOR = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4), thread_name_prefix="mcp-node")
+
+# Metadata key marking the LLM call whose tokens are streamed to the user
+# (langgraph's "messages" stream mode forwards run metadata, not tags)
+FINAL_RESPONSE_KEY = "final_response"
+
+# Response cleanup patterns, compiled once
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_BULLET_RE = re.compile(r'^- ', re.MULTILINE)
+_LINEBREAKS_RE = re.compile(r'\n{3,}')
+_DASHES_RE = re.compile(r'^-+\s*$', re.MULTILINE)
+_ROWS_RE = re.compile(r'^Query Results \(\d+ rows\):\s*\n')
+_CODEBLOCK_RE = re.compile(r'^```(?:sql|json)?\s*\n?(.*?)\n?```\s*$', re.DOTALL)
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return a fresh value for key, if any"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: str):
+        """Store a value for key, evicting the oldest entries"""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+# Prefixes of error strings returned by the MCP client and server tools
+MCP_ERROR_PREFIXES = ("Error:", "Error executing RAG query:", "SQL Query Error:")
+
+# Output caps for the structured LLM steps (their answers are short JSON or a single SQL statement)
+PLAN_MAX_TOKENS = 512
+INTENT_MAX_TOKENS = 128
+SQL_MAX_TOKENS = 384
+
+# Labelled examples for embedding-based intent routing
+INTENT_EXAMPLES = {
+    "metadata_query": [
+        "What is the encoder schema?",
+        "How does H265 encoding work?",
+        "What does the CODEC field mean?",
+        "What is the criteria for video quality?",
+        "How can we identify video quality?",
+        "What determines feed quality?",
+        "What encoding parameters are supported?",
+        "Explain the decoder configuration options",
+    ],
+    "data_query": [
+        "What are the camera IDs that are capturing the pacific area with the best clarity?",
+        "How many cameras are in Pacific region?",
+        "What cameras are in Pacific region?",
+        "Show me all 4K cameras",
+        "Count cameras by region",
+        "Which cameras have H265 codec?",
+        "List all cameras with high resolution",
+        "Which feeds have the highest latency?",
+    ],
+}
+INTENT_KNN_THRESHOLD = 0.8  # minimum cosine similarity to the nearest example of the winning intent
+INTENT_KNN_MARGIN = 0.05  # required lead over the nearest example of the other intent
+
+# Result lines passed to the response-generation prompt (SQL results can run to SQL_MAX_ROWS)
+PROMPT_MAX_RESULT_LINES = 100
+
+# Simple greetings, answered without any LLM call
+GREETINGS = {"hi", "hello", "hey", "hi there", "hello there", "yo", "sup", "hey there"}
+_GREETING_RE = re.compile(r'^(hi|hello|hey|greetings)[\s!.?]*$')
+GREETING_RESPONSE = "Hello! I'm your Camera Feed Query Assistant. I can help you with questions about camera feeds, system configurations, encoding/decoding parameters, and data analysis. What would you like to know?"
+
+# Answer cache for repeated queries (normalized query -> answer)
+ANSWER_CACHE_MAXSIZE = 500
+ANSWER_CACHE_TTL = 1800  # seconds
+_answer_cache = TTLCache(ANSWER_CACHE_MAXSIZE, ANSWER_CACHE_TTL)
+
+# RAG response cache, shared by metadata and data queries (query digest -> styled RAG response)
+RAG_CACHE_MAXSIZE = 1000
+RAG_CACHE_TTL = 600  # seconds
+_rag_cache = TTLCache(RAG_CACHE_MAXSIZE, RAG_CACHE_TTL)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (lowercase, no punctuation, single spaces)"""
+    return ' '.join(_PUNCTUATION_RE.sub('', query.lower()).split())
+
+
+def get_cached_answer(key: str) -> Optional[str]:
+    """Return a fresh cached answer for a normalized query, if any"""
+    return _answer_cache.get(key)
+
+
+def cache_answer(key: str, answer: str):
+    """Store an answer for a normalized query, evicting the oldest entries"""
+    _answer_cache.set(key, answer)
+
+
+@lru_cache(maxsize=4)
+def get_llm(streaming: bool = False, max_tokens: Optional[int] = None):
+    """Get the shared chat model (the streaming variant is marked for token streaming)"""
+    llm = ChatOpenAI(
+        model="gpt-4o-mini", temperature=0, streaming=streaming, max_tokens=max_tokens,
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
+    if streaming:
+        return llm.with_config(metadata={FINAL_RESPONSE_KEY: True})
+    return llm
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> OpenAIEmbeddings:
+    """Get the shared embedding model"""
+    return OpenAIEmbeddings(model="text-embedding-3-small", api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def embed_query(query: str) -> Optional[list]:
+    """Embed a query for semantic cache lookups, or None if embedding fails"""
+    try:
+        return get_embeddings().embed_query(query)
+    except Exception as e:
+        logger.warning("❌ Error embedding query for semantic cache: %s", e)
+        return None
+
+
+@lru_cache(maxsize=1)
+def _intent_example_matrix() -> Tuple[np.ndarray, Tuple[str, ...]]:
+    """Embed the labelled intent examples once, as unit rows with a parallel label tuple"""
+    labels = tuple(label for label, examples in INTENT_EXAMPLES.items() for _ in examples)
+    texts = [text for examples in INTENT_EXAMPLES.values() for text in examples]
+    matrix = np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix, labels
+
+
+def classify_by_examples(embedding: list) -> Optional[dict]:
+    """Classify clear-cut queries by nearest labelled example, or None when the examples are inconclusive"""
+    try:
+        matrix, labels = _intent_example_matrix()
+    except Exception as e:
+        logger.warning("❌ Error embedding intent examples: %s", e)
+        return None
+    
+    vector = np.asarray(embedding, dtype=np.float32)
+    scores = matrix @ (vector / np.linalg.norm(vector))
+    best = {}
+    for label, score in zip(labels, scores):
+        best[label] = max(best.get(label, -1.0), float(score))
+    
+    metadata_score = best.get("metadata_query", -1.0)
+    data_score = best.get("data_query", -1.0)
+    for intent, score, other in (("metadata_query", metadata_score, data_score), ("data_query", data_score, metadata_score)):
+        if score >= INTENT_KNN_THRESHOLD and score - other >= INTENT_KNN_MARGIN:
+            return {"intent": intent, "confidence": score, "reasoning": "nearest labelled example"}
+    return None
+
+
+def remember_answer(cache_key: str, embedding: Optional[list], answer: str):
+    """Store a metadata answer in the exact and semantic caches"""
+    cache_answer(cache_key, answer)
+    if embedding is not None:
+        get_semantic_cache().add(embedding, answer)
 
 
 # Node functions
@@ -24,7 +220,7 @@ def start_node(state: AgentState) -> AgentState:
 
 def summarize_conversation(state: AgentState) -> AgentState:
     """Summarize the conversation and trim old messages"""
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
+    llm = get_llm()
     
     # Get existing summary
     summary = state.get("summary", "")
@@ -43,83 +239,185 @@ def summarize_conversation(state: AgentState) -> AgentState:
     response = llm.invoke(messages)
     
     # Delete all but the 2 most recent messages
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
+    delete_messages = [RemoveMessage(id=m.id) for m in islice(state["messages"], 0, len(state["messages"]) - 2)]
     
     return {"summary": response.content, "messages": delete_messages}
 
 
 def mcp_client_node(state: AgentState) -> AgentState:
     """MCP Client node: ReAct-style tool selection and execution"""
-    print(f"\n🚀 MCP Client Node Started")
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
+    logger.info("🚀 MCP Client Node Started")
+    llm = get_llm()
     
     # Get the latest user message
     messages = state.get("messages", [])
-    print(f"📨 Messages count: {len(messages)}")
+    logger.debug("📨 Messages count: %d", len(messages))
     
     if not messages:
-        print("❌ No messages found")
+        logger.warning("❌ No messages found")
         return {"messages": [AIMessage(content="No message to process")]}
     
     latest_message = messages[-1]
-    print(f"📝 Latest message type: {type(latest_message)}")
+    logger.debug("📝 Latest message type: %s", type(latest_message))
     
     if isinstance(latest_message, HumanMessage):
         query = latest_message.content
-        print(f"❓ User query: {query}")
+        logger.info("❓ User query: %s", query)
+        
+        # Serve repeated queries straight from the answer cache
+        cache_key = normalize_query(query)
+        cached = get_cached_answer(cache_key)
+        if cached is not None:
+            logger.info("⚡ Answer cache hit")
+            return {"messages": [AIMessage(content=cached)]}
         
-        # Step 1: Analyze the query to determine intent
-        print(f"🔍 Analyzing query intent...")
-        intent_analysis = analyze_query_intent(query, llm)
-        print(f"🎯 Intent analysis result: {intent_analysis}")
+        # Plain greetings need no LLM, embedding or RAG call
+        if match_greeting(query):
+            logger.info("👋 Handling as general greeting")
+            return {"messages": [AIMessage(content=GREETING_RESPONSE)]}
+        
+        # Fall back to the semantic cache for paraphrased queries (it holds metadata answers only)
+        embedding = embed_query(query)
+        if embedding is not None:
+            cached = get_semantic_cache().lookup(embedding)
+            if cached is not None:
+                logger.info("⚡ Semantic cache hit")
+                cache_answer(cache_key, cached)
+                return {"messages": [AIMessage(content=cached)]}
+        
+        # Step 1: Route clear-cut metadata questions by example similarity, otherwise
+        # plan the query (intent plus a SQL draft for data queries) in one LLM call
+        example_intent = classify_by_examples(embedding) if embedding is not None else None
+        rag_future = None
+        if example_intent is not None and example_intent["intent"] == "metadata_query":
+            intent_analysis = example_intent
+        else:
+            if example_intent is None:
+                # Intent unclear: fetch RAG context speculatively while the query is planned
+                rag_future = _EXECUTOR.submit(call_rag_tool, query, llm)
+            logger.debug("🔍 Planning query...")
+            intent_analysis = plan_query(query, get_llm(max_tokens=PLAN_MAX_TOKENS))
+        logger.info("🎯 Query plan: %s", intent_analysis)
+        
+        if rag_future is not None and (intent_analysis["intent"] == "general_greeting" or (
+            intent_analysis["intent"] == "data_query" and intent_analysis.get("sql")
+        )):
+            # RAG context is not needed, drop it if it has not started yet
+            rag_future.cancel()
         
         if intent_analysis["intent"] == "general_greeting":
-            print("👋 Handling as general greeting")
-            return {"messages": [AIMessage(content="Hello! I'm your Camera Feed Query Assistant. I can help you with questions about camera feeds, system configurations, encoding/decoding parameters, and data analysis. What would you like to know?")]}
+            logger.info("👋 Handling as general greeting")
+            return {"messages": [AIMessage(content=GREETING_RESPONSE)]}
         
         elif intent_analysis["intent"] == "metadata_query":
-            print("📚 Handling as metadata query")
+            logger.info("📚 Handling as metadata query")
             # Use RAG tool for general information about schemas, parameters, etc.
-            rag_response = call_rag_tool(query, llm)
-            print(f"📖 RAG response: {rag_response[:100]}...")
+            rag_response = rag_future.result() if rag_future is not None else call_rag_tool(query, llm)
+            logger.debug("📖 RAG response: %.100s...", rag_response)
+            if not rag_response.startswith(("RAG Query Error:", "RAG Tool Error:")):
+                remember_answer(cache_key, embedding, rag_response)
             return {"messages": [AIMessage(content=rag_response)]}
         
         elif intent_analysis["intent"] == "data_query":
-            print("📊 Handling as data query")
-            # First get metadata, then formulate and execute SQL
-            print("🔍 Step 1: Getting RAG context...")
-            rag_response = call_rag_tool(query, llm)
-            print(f"📖 RAG response: {rag_response[:100]}...")
-            
-            print("🔍 Step 2: Formulating SQL query...")
-            sql_query = formulate_sql_query(query, rag_response, llm)
-            print(f"📝 Generated SQL: {sql_query}")
+            logger.info("📊 Handling as data query")
+            sql_query = intent_analysis.get("sql")
+            if not sql_query:
+                # No draft from the planner: get metadata, then formulate SQL
+                logger.debug("🔍 Step 1: Getting RAG context...")
+                rag_response = rag_future.result() if rag_future is not None else call_rag_tool(query, llm)
+                logger.debug("📖 RAG response: %.100s...", rag_response)
+                
+                logger.debug("🔍 Step 2: Formulating SQL query...")
+                sql_query = formulate_sql_query(query, rag_response, llm)
+            logger.info("📝 Generated SQL: %s", sql_query)
             
-            print("🔍 Step 3: Executing SQL query...")
+            logger.debug("🔍 Step 3: Executing SQL query...")
             sql_result = call_sql_tool(sql_query, llm)
-            print(f"📊 SQL result: {sql_result[:100]}...")
+            logger.debug("📊 SQL result: %.100s...", sql_result)
             
-            print("🔍 Step 4: Generating detailed response...")
-            detailed_response = generate_detailed_response(query, sql_result, llm)
-            print(f"📝 Detailed response: {detailed_response[:100]}...")
+            logger.debug("🔍 Step 4: Generating detailed response...")
+            detailed_response = generate_detailed_response(query, sql_result, get_llm(streaming=True))
+            logger.debug("📝 Detailed response: %.100s...", detailed_response)
             
-            print(f"✅ Final response length: {len(detailed_response)}")
+            logger.info("✅ Final response length: %d", len(detailed_response))
+            if not sql_result.startswith(("SQL Query Error:", "SQL Tool Error:")):
+                # Exact cache only: paraphrases that differ in one codec, region or number
+                # embed as near-duplicates but need their own SQL result
+                cache_answer(cache_key, detailed_response)
             return {"messages": [AIMessage(content=detailed_response)]}
         
         else:
-            print(f"❓ Unknown intent: {intent_analysis['intent']}")
+            logger.warning("❓ Unknown intent: %s", intent_analysis["intent"])
             return {"messages": [AIMessage(content="I'm not sure how to help with that. Please ask about camera feeds, system configurations, or data analysis.")]}
     else:
-        print("❌ Latest message is not a HumanMessage")
+        logger.warning("❌ Latest message is not a HumanMessage")
         return {"messages": [AIMessage(content="Please provide a question to query the data")]}
 
 
-def analyze_query_intent(query: str, llm: ChatOpenAI) -> dict:
-    """Analyze user query to determine intent and appropriate tool"""
-    intent_prompt = f"""
-    Analyze this user query and determine the intent:
+def match_greeting(query: str) -> Optional[dict]:
+    """Return a general_greeting intent if the query is just a simple greeting"""
+    stripped = query.strip().lower().rstrip('!.?')
+    if stripped in GREETINGS or _GREETING_RE.match(stripped):
+        return {"intent": "general_greeting", "confidence": 1.0, "reasoning": "matched greeting pattern"}
+    return None
+
+
+PLAN_SYSTEM_PROMPT = """
+    Plan how to answer user queries about camera feeds.
+    
+    Classify the intent as one of:
+    1. "general_greeting" - ONLY simple greetings like "hi", "hello", "hey" (nothing else)
+    2. "data_query" - Questions asking for specific data, lists, counts, numbers, or analysis of actual camera feed data
+    3. "metadata_query" - ALL OTHER queries including questions about schemas, parameters, configurations, definitions, how things work, what something means, criteria, quality standards, technical concepts, explanations, etc.
+    
+    IMPORTANT RULES:
+    - ONLY classify as "general_greeting" if the query is JUST a simple greeting (hi, hello, hey)
+    - Questions with "how many", "which", "what cameras", "show me", "list", "count" should be classified as data_query
+    - EVERYTHING ELSE that is not a simple greeting and not asking for specific data should be classified as metadata_query
     
-    Query: "{query}"
+    For a data_query, also write a PostgreSQL query that answers it. For any other intent, sql must be null.
+    The name of the table is "camera_feeds", with columns:
+    - feed_id: Camera identifier
+    - theater: Region (PAC, EUR, CONUS, ME, AFR, ARC)
+    - frrate: Frame rate
+    - res_w, res_h: Resolution width and height
+    - codec: Video codec (H264, H265, VP9, MPEG2, AV1)
+    - encr: Encryption status
+    - lat_ms: Latency in milliseconds
+    - modl_tag: Model tag
+    - civ_ok: Civilian status
+    For counting questions (like "how many cameras"), use COUNT(*) with appropriate WHERE clauses.
+    For listing questions, use SELECT * with appropriate WHERE clauses.
+    
+    Respond with JSON: {"intent": "intent_type", "confidence": 0.9, "reasoning": "explanation", "sql": "SELECT ... or null"}
+    """
+
+
+def plan_query(query: str, llm: ChatOpenAI) -> dict:
+    """Classify the query and draft its SQL in a single structured LLM call"""
+    greeting = match_greeting(query)
+    if greeting:
+        return {**greeting, "sql": None}
+    
+    try:
+        planner = llm.with_structured_output(QueryPlan, method="json_mode")
+        plan = planner.invoke([
+            SystemMessage(content=PLAN_SYSTEM_PROMPT),
+            HumanMessage(content=f'Plan how to answer this user query about camera feeds:\n\nQuery: "{query}"')
+        ])
+        result = plan.model_dump()
+        if result["intent"] != "data_query":
+            result["sql"] = None
+        logger.debug("✅ Parsed plan: %s", result)
+        return result
+    except Exception as e:
+        logger.warning("❌ Error in LLM query planning: %s", e)
+        # Fall back to the separate intent analysis call
+        return analyze_query_intent(query, llm)
+
+
+INTENT_SYSTEM_PROMPT = """
+    Analyze user queries and determine the intent.
     
     Classify the intent as one of:
     1. "general_greeting" - ONLY simple greetings like "hi", "hello", "hey" (nothing else)
@@ -149,79 +447,80 @@ def analyze_query_intent(query: str, llm: ChatOpenAI) -> dict:
     - "Which cameras have H265 codec?" -> data_query
     - "List all cameras with high resolution" -> data_query
     
-    Respond with JSON: {{"intent": "intent_type", "confidence": 0.9, "reasoning": "explanation"}}
+    Respond with JSON: {"intent": "intent_type", "confidence": 0.9, "reasoning": "explanation"}
     """
+
+
+def analyze_query_intent(query: str, llm: ChatOpenAI) -> dict:
+    """Analyze user query to determine intent and appropriate tool"""
+    greeting = match_greeting(query)
+    if greeting:
+        return greeting
     
-    response = llm.invoke([HumanMessage(content=intent_prompt)])
+    response = llm.invoke([
+        SystemMessage(content=INTENT_SYSTEM_PROMPT),
+        HumanMessage(content=f'Analyze this user query and determine the intent:\n\nQuery: "{query}"')
+    ], max_tokens=INTENT_MAX_TOKENS)
     
-    print(f"🔍 LLM Intent Response: '{response.content}'")
+    logger.debug("🔍 LLM Intent Response: '%s'", response.content)
     
     try:
-        import json
-        import re
-        
         # Extract JSON from markdown code blocks if present
         content = response.content.strip()
         
         # Remove markdown code block formatting
-        if content.startswith('```json'):
-            content = content[7:]  # Remove ```json
-        elif content.startswith('```'):
-            content = content[3:]   # Remove ```
+        content = strip_code_fence(content)
         
-        if content.endswith('```'):
-            content = content[:-3]  # Remove trailing ```
-        
-        content = content.strip()
-        
-        result = json.loads(content)
-        print(f"✅ Parsed intent: {result}")
+        result = orjson.loads(content)
+        logger.debug("✅ Parsed intent: %s", result)
         return result
     except Exception as e:
-        print(f"❌ Error in LLM intent analysis: {e}")
-        print(f"Raw response content: '{response.content}'")
+        logger.warning("❌ Error in LLM intent analysis: %s (raw response: '%s')", e, response.content)
         # If LLM fails, default to metadata_query to be safe
         return {"intent": "metadata_query", "confidence": 0.5, "reasoning": f"LLM analysis failed: {str(e)}"}
 
 
 def call_rag_tool(query: str, llm: ChatOpenAI) -> str:
     """Call RAG tool and return formatted response"""
-    print(f"🔍 RAG Tool: Starting query: {query}")
+    logger.debug("🔍 RAG Tool: Starting query: %s", query)
+    
+    # Reuse a recent RAG response for the same query
+    cache_key = hashlib.blake2b(normalize_query(query).encode(), digest_size=16).hexdigest()
+    cached = _rag_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("⚡ RAG Tool: Cache hit")
+        return cached
+    
     try:
         # Tool call to RAG
-        print(f"🔍 RAG Tool: Calling rag_query_via_mcp...")
+        logger.debug("🔍 RAG Tool: Calling rag_query_via_mcp...")
         rag_response = rag_query_via_mcp(query, top_k=5)
-        print(f"🔍 RAG Tool: Raw response: {rag_response[:200]}...")
+        logger.debug("🔍 RAG Tool: Raw response: %.200s...", rag_response)
         
         # Format the response
-        if "Error:" in rag_response:
-            print(f"❌ RAG Tool: Error in response")
+        if rag_response.startswith(MCP_ERROR_PREFIXES):
+            logger.warning("❌ RAG Tool: Error in response")
             return f"RAG Query Error: {rag_response}"
         else:
             # Remove sources section from response
-            print(f"🔍 RAG Tool: Removing sources...")
+            logger.debug("🔍 RAG Tool: Removing sources...")
             cleaned_response = remove_sources_from_response(rag_response)
-            print(f"🔍 RAG Tool: After removing sources: {cleaned_response[:200]}...")
+            logger.debug("🔍 RAG Tool: After removing sources: %.200s...", cleaned_response)
             
             # Clean up markdown formatting
-            print(f"🔍 RAG Tool: Cleaning markdown...")
+            logger.debug("🔍 RAG Tool: Cleaning markdown...")
             styled_response = clean_markdown_formatting(cleaned_response)
-            print(f"🔍 RAG Tool: Final styled response: {styled_response[:200]}...")
+            logger.debug("🔍 RAG Tool: Final styled response: %.200s...", styled_response)
+            _rag_cache.set(cache_key, styled_response)
             return styled_response
     except Exception as e:
-        print(f"❌ RAG Tool: Exception: {str(e)}")
+        logger.error("❌ RAG Tool: Exception: %s", e)
         return f"RAG Tool Error: {str(e)}"
 
 
-def formulate_sql_query(query: str, rag_context: str, llm: ChatOpenAI) -> str:
-    """Formulate SQL query based on user query and RAG context"""
-    sql_prompt = f"""
-    Based on the user query: "{query}"
-    And the relevant metadata information: "{rag_context}"
-    
+SQL_SYSTEM_PROMPT = """
     Generate a SQL query to answer the user's question.
     Use the metadata to understand the table structure and relationships.
-    docker-compose down && docker-compose up --build -d
     The name of the table is "camera_feeds".
     Important: Return ONLY the SQL query, no markdown formatting, no explanations, no backticks.
     Just the pure SQL statement.
@@ -240,64 +539,64 @@ def formulate_sql_query(query: str, rag_context: str, llm: ChatOpenAI) -> str:
     For counting questions (like "how many cameras"), use COUNT(*) with appropriate WHERE clauses.
     For listing questions, use SELECT * with appropriate WHERE clauses.
     """
-    
-    response = llm.invoke([HumanMessage(content=sql_prompt)])
+
+
+def formulate_sql_query(query: str, rag_context: str, llm: ChatOpenAI) -> str:
+    """Formulate SQL query based on user query and RAG context"""
+    response = llm.invoke([
+        SystemMessage(content=SQL_SYSTEM_PROMPT),
+        HumanMessage(content=f'Relevant metadata information: "{rag_context}"\nUser query: "{query}"')
+    ], max_tokens=SQL_MAX_TOKENS)
     sql_query = response.content.strip()
     
     # Clean up any markdown formatting
-    if sql_query.startswith("```sql"):
-        sql_query = sql_query[6:]
-    if sql_query.startswith("```"):
-        sql_query = sql_query[3:]
-    if sql_query.endswith("```"):
-        sql_query = sql_query[:-3]
-    
-    sql_query = sql_query.strip()
+    sql_query = strip_code_fence(sql_query)
     
     # Print/log the generated SQL query
-    print(f"\n🔍 Generated SQL Query:")
-    print(f"📝 Query: {sql_query}")
-    print(f"📊 User Question: {query}")
-    print("-" * 80)
+    logger.info("🔍 Generated SQL Query: %s (user question: %s)", sql_query, query)
     
     return sql_query
 
 
 def call_sql_tool(sql_query: str, llm: ChatOpenAI) -> str:
     """Call SQL tool and return formatted response"""
-    print(f"🔍 SQL Tool: Starting query: {sql_query}")
+    logger.debug("🔍 SQL Tool: Starting query: %s", sql_query)
     try:
         # Print/log the SQL query being executed
-        print(f"\n⚡ Executing SQL Query:")
-        print(f"🔧 Query: {sql_query}")
-        print("-" * 80)
+        logger.info("⚡ Executing SQL Query: %s", sql_query)
         
         # Tool call to SQL
-        print(f"🔍 SQL Tool: Calling sql_query_via_mcp...")
+        logger.debug("🔍 SQL Tool: Calling sql_query_via_mcp...")
         sql_result = sql_query_via_mcp(sql_query)
-        print(f"🔍 SQL Tool: Raw SQL result: {sql_result[:200]}...")
+        logger.debug("🔍 SQL Tool: Raw SQL result: %.200s...", sql_result)
         
         # Print/log the SQL result
-        print(f"\n📋 SQL Query Result:")
-        print(f"✅ Result: {sql_result[:200]}{'...' if len(sql_result) > 200 else ''}")
-        print("-" * 80)
+        logger.info("📋 SQL Query Result (%d chars): %.200s", len(sql_result), sql_result)
         
         # Format the response
-        if "Error:" in sql_result:
-            print(f"❌ SQL Tool: Error in result")
+        if sql_result.startswith(MCP_ERROR_PREFIXES):
+            logger.warning("❌ SQL Tool: Error in result")
             return f"SQL Query Error: {sql_result}"
         else:
             # Clean up the SQL result formatting
-            print(f"🔍 SQL Tool: Cleaning result formatting...")
+            logger.debug("🔍 SQL Tool: Cleaning result formatting...")
             cleaned_result = clean_sql_result_formatting(sql_result)
-            print(f"🔍 SQL Tool: Final cleaned result: {cleaned_result[:200]}...")
+            logger.debug("🔍 SQL Tool: Final cleaned result: %.200s...", cleaned_result)
             return cleaned_result
     except Exception as e:
-        print(f"\n❌ SQL Tool Error: {str(e)}")
-        print("-" * 80)
+        logger.error("❌ SQL Tool Error: %s", e)
         return f"SQL Tool Error: {str(e)}"
 
 
+def strip_code_fence(content: str) -> str:
+    """Strip a surrounding markdown code fence (```, ```sql or ```json) from LLM output"""
+    match = _CODEBLOCK_RE.match(content)
+    if match:
+        return match.group(1).strip()
+    # Unbalanced fence: drop whichever side is present
+    return content.removeprefix('```json').removeprefix('```sql').removeprefix('```').removesuffix('```').strip()
+
+
 def remove_sources_from_response(response: str) -> str:
     """Remove sources section from RAG response"""
     # Split by "Sources:" and take only the first part
@@ -308,8 +607,6 @@ def remove_sources_from_response(response: str) -> str:
 
 def clean_markdown_formatting(response: str) -> str:
     """Clean up markdown formatting for better readability"""
-    import re
-    
     # Remove "Answer:" prefix if present
     if response.startswith("Answer:"):
         response = response[7:].strip()
@@ -320,16 +617,16 @@ def clean_markdown_formatting(response: str) -> str:
     
     # Clean up excessive markdown formatting
     # Replace **text** with just text (remove bold formatting)
-    response = re.sub(r'\*\*(.*?)\*\*', r'\1', response)
+    response = _BOLD_RE.sub(r'\1', response)
     
     # Replace *text* with just text (remove italic formatting)
-    response = re.sub(r'\*(.*?)\*', r'\1', response)
+    response = _ITALIC_RE.sub(r'\1', response)
     
     # Clean up bullet points - replace - with •
-    response = re.sub(r'^- ', '• ', response, flags=re.MULTILINE)
+    response = _BULLET_RE.sub('• ', response)
     
     # Remove excessive line breaks (more than 2 consecutive)
-    response = re.sub(r'\n{3,}', '\n\n', response)
+    response = _LINEBREAKS_RE.sub('\n\n', response)
     
     # Clean up any remaining markdown artifacts
     response = response.replace('```', '').replace('`', '')
@@ -339,20 +636,18 @@ def clean_markdown_formatting(response: str) -> str:
 
 def clean_sql_result_formatting(sql_result: str) -> str:
     """Clean up SQL result formatting for better readability"""
-    import re
-    
     # Remove "SQL Results:" prefix if present
     if sql_result.startswith("SQL Results:"):
         sql_result = sql_result[12:].strip()
     
     # Remove "Query Results (X rows):" prefix if present
-    sql_result = re.sub(r'^Query Results \(\d+ rows\):\s*\n', '', sql_result)
+    sql_result = _ROWS_RE.sub('', sql_result)
     
     # Remove table separators (lines with dashes)
-    sql_result = re.sub(r'^-+\s*$', '', sql_result, flags=re.MULTILINE)
+    sql_result = _DASHES_RE.sub('', sql_result)
     
     # Clean up excessive line breaks
-    sql_result = re.sub(r'\n{3,}', '\n\n', sql_result)
+    sql_result = _LINEBREAKS_RE.sub('\n\n', sql_result)
     
     # Remove empty lines at the beginning and end
     sql_result = sql_result.strip()
@@ -360,14 +655,17 @@ def clean_sql_result_formatting(sql_result: str) -> str:
     return sql_result
 
 
-def generate_detailed_response(query: str, sql_result: str, llm: ChatOpenAI) -> str:
-    """Generate a detailed, user-friendly response based on the query and SQL results"""
-    response_prompt = f"""
+def trim_sql_result_for_prompt(sql_result: str, max_lines: int = PROMPT_MAX_RESULT_LINES) -> str:
+    """Keep the first result lines for the response prompt, noting how many were left out"""
+    lines = sql_result.splitlines()
+    if len(lines) <= max_lines:
+        return sql_result
+    return "\n".join(lines[:max_lines]) + f"\n... ({len(lines) - max_lines} more rows not shown)"
+
+
+RESPONSE_SYSTEM_PROMPT = """
     Based on the user's question and the SQL query results, provide a detailed, conversational response.
     
-    User Question: "{query}"
-    SQL Results: "{sql_result}"
-    
     Instructions:
     1. Provide a clear, direct answer to the user's question
     2. Make the response conversational and easy to understand
@@ -383,12 +681,18 @@ def generate_detailed_response(query: str, sql_result: str, llm: ChatOpenAI) ->
     
     Provide only the response, no additional formatting or explanations.
     """
-    
+
+
+def generate_detailed_response(query: str, sql_result: str, llm: ChatOpenAI) -> str:
+    """Generate a detailed, user-friendly response based on the query and SQL results"""
     try:
-        response = llm.invoke([HumanMessage(content=response_prompt)])
+        response = llm.invoke([
+            SystemMessage(content=RESPONSE_SYSTEM_PROMPT),
+            HumanMessage(content=f'User Question: "{query}"\nSQL Results: "{trim_sql_result_for_prompt(sql_result)}"')
+        ])
         return response.content.strip()
     except Exception as e:
-        print(f"❌ Error generating detailed response: {str(e)}")
+        logger.error("❌ Error generating detailed response: %s", e)
         # Fallback to cleaned SQL result
         return clean_sql_result_formatting(sql_result)
 
@@ -0,0 +1,107 @@
+"""
+Semantic Cache - Reuses answers for paraphrased queries
+Looks up query embeddings with random-projection LSH and cosine similarity
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """LRU answer cache keyed by query embeddings"""
+
+    def __init__(self, dim: int = 1536, capacity: int = 10_000, tables: int = 8,
+                 bits: int = 16, threshold: float = 0.95, seed: int = 0):
+        self.capacity = capacity
+        self.threshold = threshold
+
+        # Random hyperplanes: one (dim, bits) projection per hash table
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((tables, dim, bits)).astype(np.float32)
+        self._bit_weights = (1 << np.arange(bits)).astype(np.uint32)
+
+        # Unit-normalized embeddings and their answers, stored by slot
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._slot_keys: List[Optional[Tuple[int, ...]]] = [None] * capacity
+        self._buckets = [defaultdict(set) for _ in range(tables)]
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._free = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def _normalize(self, embedding) -> np.ndarray:
+        """Return the embedding as a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hash(self, vector: np.ndarray) -> Tuple[int, ...]:
+        """Hash a vector to one bucket key per table from the signs of its projections"""
+        signs = np.einsum('d,tdb->tb', vector, self._planes) > 0
+        return tuple(int(key) for key in signs.astype(np.uint32) @ self._bit_weights)
+
+    def lookup(self, embedding) -> Optional[str]:
+        """Return the cached answer for a near-duplicate query, if any"""
+        vector = self._normalize(embedding)
+        keys = self._hash(vector)
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self._buckets, keys):
+                candidates |= table.get(key, set())
+            if not candidates:
+                return None
+
+            slots = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+            similarities = self._vectors[slots] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            slot = int(slots[best])
+            self._lru.move_to_end(slot)
+            return self._answers[slot]
+
+    def add(self, embedding, answer: str):
+        """Cache an answer under a query embedding, evicting the least recently used entry"""
+        vector = self._normalize(embedding)
+        keys = self._hash(vector)
+        with self._lock:
+            if not self._free:
+                self._evict(next(iter(self._lru)))
+
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._answers[slot] = answer
+            self._slot_keys[slot] = keys
+            for table, key in zip(self._buckets, keys):
+                table[key].add(slot)
+            self._lru[slot] = None
+
+    def _evict(self, slot: int):
+        """Remove a slot from the buckets and return it to the free list"""
+        for table, key in zip(self._buckets, self._slot_keys[slot]):
+            bucket = table[key]
+            bucket.discard(slot)
+            if not bucket:
+                del table[key]
+        del self._lru[slot]
+        self._answers[slot] = None
+        self._slot_keys[slot] = None
+        self._free.append(slot)
+
+
+# Global cache instance
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> SemanticCache:
+    """Get or create the semantic cache instance"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache()
+    return _semantic_cache
@@ -3,6 +3,9 @@ Graph Visualizer
 Handles graph structure visualization
 """
 
+import hashlib
+import os
+
 def save_graph_visualization(graph, filename="src/visualization/graph_visualization.png"):
     """Save graph visualization as PNG file"""
     try:
@@ -14,9 +17,21 @@ def save_graph_visualization(graph, filename="src/visualization/graph_visualizat
             # It's the raw graph
             actual_graph = graph
         
-        png_data = actual_graph.get_graph().draw_mermaid_png()
+        # Skip the Mermaid render when the PNG on disk already matches this graph
+        drawable = actual_graph.get_graph()
+        graph_hash = hashlib.blake2b(drawable.draw_mermaid().encode(), digest_size=16).hexdigest()
+        hash_file = f"{filename}.hash"
+        if os.path.exists(filename) and os.path.exists(hash_file):
+            with open(hash_file) as f:
+                if f.read().strip() == graph_hash:
+                    print(f"✅ Graph visualization unchanged, keeping '{filename}'")
+                    return True
+        
+        png_data = drawable.draw_mermaid_png()
         with open(filename, "wb") as f:
             f.write(png_data)
+        with open(hash_file, "w") as f:
+            f.write(graph_hash)
         print(f"✅ Graph visualization saved as '{filename}'")
         return True
     except Exception as e:
@@ -27,10 +42,10 @@ def save_graph_visualization(graph, filename="src/visualization/graph_visualizat
 if __name__ == "__main__":
     """Standalone script to save the LangGraph workflow visualization"""
     import sys
-    import os
-    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # Run as a script: make the repository root importable so `src` resolves as a package
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     
-    from services.graph_service import graph
+    from src.services.graph_service import graph
     
     print("🔄 Generating graph visualization...")
     
@@ -0,0 +1,74 @@
+"""
+Tests for token streaming through GraphWithMemory.stream
+"""
+
+import threading
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, START, END
+
+from src.models.state_models import AgentState
+from src.services.graph_service import GraphWithMemory
+from src.services.nodes import FINAL_RESPONSE_KEY
+
+
+def build_streaming_graph(finished: threading.Event):
+    """Graph whose response node streams a marked LLM answer, followed by a node that flags completion"""
+    planner = GenericFakeChatModel(messages=iter([AIMessage(content='{"intent": "data_query"}')]))
+    responder = GenericFakeChatModel(
+        messages=iter([AIMessage(content="There are 26 cameras in the Pacific region.")])
+    ).with_config(metadata={FINAL_RESPONSE_KEY: True})
+
+    def respond(state: AgentState) -> AgentState:
+        planner.invoke(state["messages"])
+        return {"messages": [responder.invoke(state["messages"])]}
+
+    def finish(state: AgentState) -> AgentState:
+        finished.set()
+        return {"tool_results": {}}
+
+    graph_builder = StateGraph(AgentState)
+    graph_builder.add_node("respond", respond)
+    graph_builder.add_node("finish", finish)
+    graph_builder.add_edge(START, "respond")
+    graph_builder.add_edge("respond", "finish")
+    graph_builder.add_edge("finish", END)
+    return GraphWithMemory(graph_builder.compile())
+
+
+def test_stream_yields_tokens_before_graph_finishes():
+    finished = threading.Event()
+    graph = build_streaming_graph(finished)
+
+    chunks_before_finish = []
+    chunks = []
+    for chunk in graph.stream(
+        {"messages": [HumanMessage(content="How many cameras are in Pacific region?")]},
+        {"configurable": {"thread_id": "test-stream-tokens"}}
+    ):
+        chunks.append(chunk)
+        if not finished.is_set():
+            chunks_before_finish.append(chunk)
+
+    assert len(chunks_before_finish) > 1
+    # Only the marked model is streamed, and its tokens add up to the full answer
+    assert "".join(chunks) == "There are 26 cameras in the Pacific region."
+
+
+def test_stream_falls_back_to_whole_answer_without_marked_llm():
+    def respond(state: AgentState) -> AgentState:
+        return {"messages": [AIMessage(content="Hello! How can I help?")]}
+
+    graph_builder = StateGraph(AgentState)
+    graph_builder.add_node("respond", respond)
+    graph_builder.add_edge(START, "respond")
+    graph_builder.add_edge("respond", END)
+    graph = GraphWithMemory(graph_builder.compile())
+
+    chunks = list(graph.stream(
+        {"messages": [HumanMessage(content="hi")]},
+        {"configurable": {"thread_id": "test-stream-fallback"}}
+    ))
+
+    assert chunks == ["Hello! How can I help?"]